@@ -9,112 +9,208 @@ import pygame
 import random
 import math
 import os
+import threading
+
+import numpy
 
 from utilities import *
 
+class EffectPriority:
+    LOW = 0 # Shed first when there are too many particles (rocket smoke)
+    NORMAL = 1 # Portals
+    HIGH = 2 # Shed last (breaking boxes, animations)
+
 class TextureAlternatingMode:
     RANDOMLY = 0 # Textures spawn with a random texture from the list
     TIMED = 1 # Texture will spawn with the first texture of the list and textures will evolve.
 
+class TextureSets(object):
+    '''
+    Registry of the texture sets of the effects (every texture of a directory).
+    Each directory is scanned once, and its textures are loaded once in a list of surfaces per size: spawning effects doesn't access the file system nor load any image.
+    '''
+    def __init__(self, check_changes = False):
+        '''
+        Parameters:
+            check_changes (bool) : If True, a directory is scanned (and its textures loaded) again when it or one of its files is modified.
+                Useful while editing textures, but it costs system calls each time a set is used.
+        '''
+        self.check_changes = check_changes
+
+        self.paths = {} # {directory: [texture path, ...]}
+        self.images = {} # {(tuple(texture path, ...), size): [pygame.Surface, ...]}
+        self.signatures = {} # {directory: modification times of the directory and its files, when scanned}
+
+    def get_signature(self, directory):
+        '''
+        Returns:
+            tuple : The modification times of a directory and of its files
+        '''
+        return (os.stat(directory).st_mtime_ns,) + tuple(os.stat(os.path.join(directory, item)).st_mtime_ns for item in sorted(os.listdir(directory)))
+
+    def get_paths(self, directory):
+        '''
+        Get the list of every textures of a directory (the returned list must not be modified).
+        Parameters:
+            directory (str) : The path to the folder containing the textures
+        Returns:
+            [str, ...] : The list contaning paths of all the textures
+        '''
+        if directory not in self.paths:
+            self.scan(directory)
+        elif self.check_changes and self.get_signature(directory) != self.signatures[directory]:
+            self.scan(directory, force_import = True)
+        return self.paths[directory]
+
+    def scan(self, directory, force_import = False):
+        '''
+        List the textures of a directory.
+        Parameters:
+            directory (str) : The path to the folder containing the textures
+            force_import (bool) : If True, textures will be loaded from their file again, even if they have already been loaded
+        '''
+        relative_path = os.path.relpath(directory)
+        content = os.listdir(directory)
+        joiner = lambda item: os.path.join(relative_path, item)
+        filtered = lambda item: not item.startswith('.')
+        textures = list(map(joiner, filter(filtered, content)))
+
+        self.paths[directory] = textures
+        if self.check_changes:
+            self.signatures[directory] = self.get_signature(directory)
+        if force_import:
+            self.images = {} # Loaded again from the new files by the next get_images
+            for path in textures:
+                load_image(path, force_import = True)
+
+    def get_images(self, textures, size = None):
+        '''
+        Get the loaded textures of a set (the returned list must not be modified).
+        Parameters:
+            textures ([str, ...]) : The paths of the textures, as returned by get_paths
+            size ( tuple(x, y) ) : The size of the textures, None for their original size
+        Returns:
+            [pygame.Surface, ...] : The loaded textures, loaded only once per set and size
+        '''
+        key = (tuple(textures), size)
+        images = self.images.get(key)
+        if images is None:
+            images = [load_image(path, size) for path in textures]
+            self.images[key] = images
+        return images
+
+    def preload(self, directories):
+        '''
+        Scan directories and load their textures, so the first effects using them don't have to.
+        Parameters:
+            directories ([str, ...]) : The paths to the folders containing the textures
+        '''
+        for directory in directories:
+            self.get_images(self.get_paths(directory))
+
+textureSets = TextureSets() # Texture sets of every effect
+
 def getTexturesFromDirectory(path):
     '''
-    Get a list of every textures of a path.
+    Get a list of every textures of a path (scanned only once, see TextureSets).
     Parameters:
         path (string) : The path to the folder containing the textures
    
     Returns:
-        [str, ...] : The list contaning paths of all the textures
+        [str, ...] : The list contaning paths of all the textures (must not be modified)
     '''
-    
-    relative_path = os.path.relpath(path)
-    content = os.listdir(path)
-    joiner = lambda item: os.path.join(relative_path, item)
-    filtered = lambda item: not item.startswith('.')
-    textures = list(map(joiner, filter(filtered, content)))
-    return textures    
-
-class UniformEffect(object):
+    return textureSets.get_paths(path)
+
+class ParticleEffect(object):
     '''
-    A Uniform effect is an effect in which particles will follow a straight trajectory before disappearing.
-    
+    A ParticleEffect shows particles starting from a point, moving with their own velocity and a common acceleration, until they get too old.
+    Particles are stored in NumPy arrays (one row per particle): they evolve all at once, and are drawn with a single Surface.blits call.
     '''
-    def __init__(self, coords, textures, quantity = 10, radius_max = 10, age_max = 10, textures_alternating_mode = TextureAlternatingMode.RANDOMLY):
+    def __init__(self, coords, textures, velocities, texture_indexes, age_max = 10, acceleration = (0, 0), timed_textures = False):
+        '''
+        Parameters:
+            coords ( tuple(x, y) ) : The position the particles start from, in pixels
+            textures ([str, ...]) : The paths of the textures
+            velocities ( [ (x, y), ...] ) : The velocity of each particle, in pixels per update
+            texture_indexes ([int, ...]) : The texture of each particle (index in textures)
+            age_max (int) : The age at which particles disappear
+            acceleration ( tuple(x, y) ) : The acceleration of every particles, in pixels per update²
+            timed_textures (bool) : If True, particles show the texture of index their age instead of their own texture
+        '''
         self.textures = textures
-        self.quantity = quantity
-        self.radius_max = radius_max
+        self.loaded_textures = textureSets.get_images(self.textures)
         self.age_max = age_max
-        self.textures_alternating_mode = textures_alternating_mode
-        
-        self.particles = []
-        
-        self.loaded_textures = list(map(load_image, self.textures))          
-        
-        for _ in range(self.quantity):
-            angle = random.uniform(0, 2 * math.pi)
-            radius = random.uniform(1, self.radius_max)
-            x = radius * math.cos(angle)
-            y = radius * math.sin(angle)
-            
-            if self.textures_alternating_mode == TextureAlternatingMode.RANDOMLY:
-                texture = random.choice(self.textures)
-            else:
-                texture = self.textures[0]
-            
-            particle = UniformParticle(texture)
-            particle.radius_max = self.radius_max
-            particle.start_coordinates = coords
-            particle.speed = (x, y)
-            
-            self.particles.append(particle)
-            
-    def present(self): 
+        self.timed_textures = timed_textures
+
+        self.start_coordinates = numpy.array(coords, dtype = float)
+        self.acceleration = numpy.array(acceleration, dtype = float)
+
+        self.velocities = numpy.array(velocities, dtype = float).reshape(-1, 2)
+        self.texture_indexes = numpy.array(texture_indexes, dtype = int)
+        self.ages = numpy.zeros(len(self.velocities), dtype = int)
+        self.positions = numpy.tile(self.start_coordinates, (len(self.velocities), 1))
+
+    def __len__(self):
         '''
-        Make particles evolve
+        Returns:
+            int : The number of particles still shown
         '''
-        for particle in self.particles:
-            particle.age += 1
-            
-            if particle.age >= self.age_max:
-                self.particles.remove(particle)
-                break
-            
-            if self.textures_alternating_mode == TextureAlternatingMode.TIMED:
-                particle.image = self.loaded_textures[particle.age]
-            
-            particle.update()
-            
-            
-            
+        return len(self.ages)
+
+    def present(self):
+        '''
+        Make particles evolve, and forget the ones that got too old
+        '''
+        self.ages += 1
+
+        alive = self.ages < self.age_max
+        if not alive.all():
+            self.ages = self.ages[alive]
+            self.velocities = self.velocities[alive]
+            self.texture_indexes = self.texture_indexes[alive]
+
+        ages = self.ages[:, numpy.newaxis]
+        self.positions = 0.5 * self.acceleration * ages ** 2 + self.velocities * ages + self.start_coordinates
+
+        if self.timed_textures:
+            self.texture_indexes = self.ages.copy()
+
     def show(self, surface):
         '''
         Show the particles on a surface
         Parameters:
             surface (pygame.surface.Surface) : The surface on which show the particles
+        Returns:
+            [pygame.Rect, ...] : The areas of the surface covered by the particles
         '''
-        for particle in self.particles:
-            particle.show(surface)
-            
+        textures = self.loaded_textures
+        return surface.blits([(textures[texture_index], position) for texture_index, position in zip(self.texture_indexes.tolist(), self.positions.tolist())])
+
 
-class UniformParticle(pygame.sprite.Sprite):
+class UniformEffect(ParticleEffect):
     '''
-    A UniformParticle will be shown by a UniformEffect.
-    A UniformParticle will move on a straight line before disappearing.
+    A Uniform effect is an effect in which particles will follow a straight trajectory before disappearing.
+    
     '''
-    def __init__(self, texture):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = load_image(texture)
-        self.x = self.y = 0
-        
-        self.age = 0
-        
-    def update(self):
-        start_x, start_y = self.start_coordinates
-        self.x = start_x + self.speed[0] * self.age
-        self.y = start_y + self.speed[1] * self.age
-        
-        
-    def show(self, surface):
-        surface.blit(self.image, (self.x, self.y))
+    def __init__(self, coords, textures, quantity = 10, radius_max = 10, age_max = 10, textures_alternating_mode = TextureAlternatingMode.RANDOMLY):
+        self.quantity = quantity
+        self.radius_max = radius_max
+        self.textures_alternating_mode = textures_alternating_mode
+
+        velocities = []
+        texture_indexes = []
+
+        for _ in range(self.quantity):
+            angle = random.uniform(0, 2 * math.pi)
+            radius = random.uniform(1, self.radius_max)
+            velocities.append((radius * math.cos(angle), radius * math.sin(angle)))
+            
+            if self.textures_alternating_mode == TextureAlternatingMode.RANDOMLY:
+                texture_indexes.append(random.randrange(len(textures)))
+            else:
+                texture_indexes.append(0)
+
+        ParticleEffect.__init__(self, coords, textures, velocities, texture_indexes, age_max, timed_textures = self.textures_alternating_mode == TextureAlternatingMode.TIMED)
         
         
         
@@ -123,92 +219,161 @@ class UniformParticle(pygame.sprite.Sprite):
         
         
         
-class GravityEffect(object):
+class GravityEffect(ParticleEffect):
     '''
     A GravityEffect is an effect in which particles will fall to the ground.
     '''
     def __init__(self, coords, textures, quantity = 10, age_max = 10):
-        self.textures = textures
         self.quantity = quantity
-        self.age_max = age_max
-        #self.acceleration = acceleration
-        #self.speed = speed
-        
-        self.particles = []
+
+        velocities = []
+        texture_indexes = []
         
         for _ in range(self.quantity):
             angle = 0 - random.uniform(0,math.pi)
-            x = 5
-            y = 5
-            
-            start_x, start_y = coords
-            delta_start_x = 0
-            delta_start_y = 0
-            
-            texture = random.choice(self.textures)
-            
-            particle = GravityParticle(texture)
-            particle.start_coordinates = (start_x + delta_start_x, start_y + delta_start_y)
-            particle.angle = angle
-            particle.speed = (x, y)
-            
-            self.particles.append(particle)
-            
-    def present(self): 
+            velocities.append((math.cos(angle) * 5, math.sin(angle) * 5))
+            texture_indexes.append(random.randrange(len(textures)))
+
+        ParticleEffect.__init__(self, coords, textures, velocities, texture_indexes, age_max, acceleration = (0, 2)) # y(t) = t² + vy * t + y0
+        
+        
+        
+class EffectManager(object):
+    '''
+    The EffectManager owns every effect shown in a level.
+    Particle effects are retired as soon as their last particle disappeared.
+    The total number of particles is capped: when there are too many, the effects of lowest priority (the oldest first) are retired.
+    '''
+    def __init__(self, particle_cap = 500):
         '''
-        Make particles evolve
+        Parameters:
+            particle_cap (int) : The maximum number of particles shown at once
         '''
-        for particle in self.particles:
-            particle.age += 1
-            particle.update()
-            
-            if particle.age >= self.age_max:
-                self.particles.remove(particle)
-            
-            
-    def show(self, surface):
+        self.particle_cap = particle_cap
+        self.effects = [] # Effects being shown, oldest first
+
+    def __len__(self):
+        return len(self.effects)
+
+    def __iter__(self):
+        return iter(self.effects)
+
+    def spawn(self, effect_type, priority, *args, **kwargs):
         '''
-        Show the particles on a surface
+        Create and show a particle effect.
         Parameters:
-            surface (pygame.surface.Surface) : The surface on which show the particles
+            effect_type (subclass of ParticleEffect) : The type of the effect
+            priority (int) : One of the EffectPriority values
+            *args, **kwargs : The parameters of the effect constructor
+        Returns:
+            ParticleEffect : The effect
         '''
-        for particle in self.particles:
-            particle.show(surface)
-            
+        return self.add(effect_type(*args, **kwargs), priority)
+
+    def add(self, effect, priority = EffectPriority.NORMAL):
+        '''
+        Show an effect (particle effect or animation).
+        Parameters:
+            effect (ParticleEffect or Animation) : The effect
+            priority (int) : One of the EffectPriority values
+        Returns:
+            The effect
+        '''
+        effect.priority = priority
+        self.effects.append(effect)
+        self.enforce_particle_cap()
+        return effect
+
+    def retire(self, effect):
+        '''
+        Stop showing an effect.
+        '''
+        self.effects.remove(effect)
+
+    def clear(self):
+        '''
+        Stop showing every effect, and stop the effects that have something running (the decoding thread of streamed animations).
+        '''
+        for effect in self.effects:
+            if hasattr(effect, 'stop'):
+                effect.stop()
+        self.effects = []
+
+    def get_particles_count(self):
+        '''
+        Returns:
+            int : The number of particles being shown
+        '''
+        return sum(len(effect) for effect in self.effects if isinstance(effect, ParticleEffect))
+
+    def enforce_particle_cap(self):
+        '''
+        Retire the effects of lowest priority, the oldest first, until there are at most particle_cap particles.
+        '''
+        excess = self.get_particles_count() - self.particle_cap
+        if excess <= 0: # Nearly always: nothing to sort
+            return
+
+        for effect in sorted(self.effects, key = lambda effect: effect.priority): # Sort is stable: oldest first for a same priority
+            if excess <= 0:
+                break
+            if isinstance(effect, ParticleEffect):
+                excess -= len(effect)
+                self.retire(effect)
+
+    def present(self):
+        '''
+        Make every effect evolve, and retire the finished particle effects
+        '''
+        for effect in self.effects:
+            effect.present()
+
+        for effect in [effect for effect in self.effects if isinstance(effect, ParticleEffect) and not len(effect)]:
+            self.retire(effect)
 
-class GravityParticle(pygame.sprite.Sprite):
-    '''
-    A GravityParticle is shown by a GravityEffect
-    A GravityParticle will fall to the ground.
-    '''
-    def __init__(self, texture):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = load_image(texture)
-        self.x = self.y = 0
-        
-        self.age = 0
-        
-    def update(self):
-        start_x, start_y = self.start_coordinates
-        self.x = math.cos(self.angle) * self.speed[0] * self.age + start_x
-        self.y = (self.age ** 2) + math.sin(self.angle) * self.speed[1] * self.age + start_y
-            
-        
     def show(self, surface):
-        surface.blit(self.image, (self.x, self.y))
-        
-        
-        
+        '''
+        Show every effect on a surface, in the order they were added
+        Returns:
+            [pygame.Rect, ...] : The areas of the surface covered by the effects
+        '''
+        rects = []
+        for effect in self.effects:
+            rects.extend(effect.show(surface))
+        return rects
+
+
 class Animation(pygame.sprite.Sprite):
     '''
     An Animation is a visual effect the purpose of which is to show sequence of images on the full window.
     It has no "particle" associated class
     '''
-    def __init__(self, images, size, image_duration = 5, repeat = False, completion = None, hide_cursor = False):
+    def __init__(self, images, size, image_duration = 5, repeat = False, completion = None, hide_cursor = False, buffer_size = None):
+        '''
+        Parameters:
+            images ([str, ...]) : The paths of the images, in order
+            size (int) : The width and height of the shown images
+            image_duration (int) : Number of updates each image is shown
+            completion (function) : Called when the last image has been shown
+            hide_cursor (bool) : If True, the mouse cursor is hidden while the animation is playing
+            buffer_size (int) : If set, the animation is streamed: a background thread decodes the images at most buffer_size images ahead, and they are forgotten once shown.
+                Use it for long animations (memory stays flat). Otherwise, every image is loaded now and kept in the images cache.
+        '''
         self.images = images
-        self.loaded_textures = list(map(lambda i: load_image(i, (size, size)), self.images))
-        
-        self.texture = self.loaded_textures[0]
+        self.size = size
+        self.buffer_size = buffer_size
+
+        if self.buffer_size:
+            self.frames = {} # {image index: decoded image} Images decoded and not shown yet, plus the current one
+            self.condition = threading.Condition()
+            self.stopped = False
+            threading.Thread(target = self.decode_frames, name = 'Animation', daemon = True).start()
+            self.texture = None # Nothing is shown until the first image is decoded: the game never waits for the decoding thread
+            self.texture_index = None # Index of the image in self.texture
+        else:
+            self.loaded_textures = list(map(lambda i: load_image(i, (size, size)), self.images))
+            self.texture = self.loaded_textures[0]
+
         self.image_duration = image_duration
         self.repeat = repeat
         self.completion = completion
@@ -219,7 +384,72 @@ class Animation(pygame.sprite.Sprite):
         
         
     
+    def decode_frames(self):
+        '''
+        Loop of the decoding thread of a streamed animation: decode the images in order, without getting more than buffer_size images ahead.
+        '''
+        for index, path in enumerate(self.images):
+            with self.condition:
+                while len(self.frames) >= self.buffer_size and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+
+            try:
+                frame = decodedImages.load(path, (self.size, self.size))
+            except Exception as e: # Raised when the frame is needed
+                frame = e
+
+            with self.condition:
+                self.frames[index] = frame
+                self.condition.notify_all()
+
+    def get_frame(self, index, wait = False):
+        '''
+        Get an image of a streamed animation, and forget the previous images.
+        The image is converted to the pixel format of the display when it is handed over, so it is blitted quickly.
+        Parameters:
+            index (int) : The index of the image
+            wait (bool) : If True, wait for the decoding thread if the image isn't decoded yet
+        Returns:
+            pygame.Surface : The image, None if it isn't decoded yet (and wait is False)
+        '''
+        with self.condition:
+            for shown_index in [i for i in self.frames if i < index]:
+                del self.frames[shown_index]
+            self.condition.notify_all()
+
+            while wait and index not in self.frames:
+                self.condition.wait()
+            frame = self.frames.get(index)
+
+        if isinstance(frame, Exception):
+            raise frame
+        if frame is not None and importedImages.format is not None:
+            frame = convert_image(frame)
+        return frame
+
+    def stop(self):
+        '''
+        Stop the decoding thread of a streamed animation, and forget its images.
+        Called when the animation ends, or when it is abandoned (see EffectManager.clear).
+        '''
+        if self.hide_cursor:
+            pygame.mouse.set_visible(True)
+
+        if self.buffer_size:
+            with self.condition:
+                self.stopped = True
+                self.frames.clear()
+                self.condition.notify_all()
+
     def present(self):
+        if self.buffer_size and self.texture is None: # The animation starts once its first image is decoded
+            self.texture = self.get_frame(0)
+            if self.texture is None:
+                return
+            self.texture_index = 0
+
         self.age += 1
         if self.age%self.image_duration == 0:
             if (self.image_index + 1) < len(self.images):
@@ -227,11 +457,19 @@ class Animation(pygame.sprite.Sprite):
                 if self.hide_cursor:
                     pygame.mouse.set_visible(False)
             else:
-                if self.hide_cursor:
-                    pygame.mouse.set_visible(True)
+                self.stop()
                 self.completion.__call__()
             
-        self.texture = self.loaded_textures[self.image_index]
+        if self.buffer_size:
+            if not self.stopped and self.texture_index != self.image_index:
+                frame = self.get_frame(self.image_index)
+                if frame is not None: # Not decoded yet: keep showing the previous image rather than freezing the game
+                    self.texture = frame
+                    self.texture_index = self.image_index
+        else:
+            self.texture = self.loaded_textures[self.image_index]
         
     def show(self, surface):
-        surface.blit(self.texture, (0, 0))
+        if self.texture is None:
+            return []
+        return [surface.blit(self.texture, (0, 0))]
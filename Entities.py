@@ -9,7 +9,6 @@ from utilities import *
 #import pygame
 import os
 import Tiles
-import Effects
 
 class Direction:
     RIGHT = 1
@@ -41,6 +40,7 @@ class Entity(object):
         self.ressources_name = 'Entity'
         self.scale = (1, 1)
         self.alternate_image = None
+        self.ressources_imported = False # Images are imported the first time the entity is drawn
 
         self.subject_gravity = True
         self.falling_time = 0 # For gravity calculation
@@ -54,16 +54,40 @@ class Entity(object):
         self.position = (0, 0)
         self.anchor_point = (0, 0)
 
+    def get_ressources(self):
+        '''
+        Returns:
+            [ (path, size), ...] : Every image of the entity and its size: the left walk cycle, the right walk cycle, the face image, then the alternate image if there is one
+        '''
+        real_size = (self.size[0] * Entity.image_side, self.size[1] * Entity.image_side)
+        paths = [os.path.join('Ressources', self.ressources_name, 'Left', path) for path in self.walk_cycle_images]
+        paths += [os.path.join('Ressources', self.ressources_name, 'Right', path) for path in self.walk_cycle_images]
+        paths.append(os.path.join('Ressources', self.ressources_name, self.face_image))
+        if self.alternate_image:
+            paths.append(os.path.join('Ressources', self.ressources_name, self.alternate_image))
+        return [(path, real_size) for path in paths]
+
     def import_ressources(self):
         '''
         Import images
+        Called lazily by get_image, so entities living in a headless Simulation never load any image.
         '''
-        real_size = (self.size[0] * Entity.image_side, self.size[1] * Entity.image_side)
-        self.walk_cycle_images_instances_left = list(map(lambda path: load_image(os.path.join('Ressources', self.ressources_name, 'Left', path), real_size), self.walk_cycle_images))
-        self.walk_cycle_images_instances_right = list(map(lambda path: load_image(os.path.join('Ressources', self.ressources_name, 'Right', path), real_size), self.walk_cycle_images))
-        self.face_image_instance = load_image(os.path.join('Ressources', self.ressources_name, self.face_image), real_size)
+        ressources = self.get_ressources()
+        walk_cycle_length = len(self.walk_cycle_images)
+
+        images = [load_image(path, size) for path, size in ressources]
+        self.walk_cycle_images_instances_left = images[:walk_cycle_length]
+        self.walk_cycle_images_instances_right = images[walk_cycle_length:2 * walk_cycle_length]
+        self.face_image_instance = images[2 * walk_cycle_length]
         if self.alternate_image:
-            self.alternate_image_instance = load_image(os.path.join('Ressources',self.ressources_name, self.alternate_image), real_size)
+            self.alternate_image_instance = images[2 * walk_cycle_length + 1]
+
+        # Vertically flipped images, shown when gravity is reversed (not for the alternate image)
+        flipped_images = [load_flipped_image(path, size) for path, size in ressources[:2 * walk_cycle_length + 1]]
+        self.walk_cycle_images_instances_left_flipped = flipped_images[:walk_cycle_length]
+        self.walk_cycle_images_instances_right_flipped = flipped_images[walk_cycle_length:2 * walk_cycle_length]
+        self.face_image_instance_flipped = flipped_images[2 * walk_cycle_length]
+        self.ressources_imported = True
 
 
     def get_image(self, antigravity = False):
@@ -74,10 +98,12 @@ class Entity(object):
         Returns:
             pygame.surface.Surface : The image of the entity that should be displayed
         '''
-        image = self.face_image_instance
-        if antigravity: # If gravity is reversed: flip image vertically
-            image = pygame.transform.flip(image, False, True)
-        return image
+        if not self.ressources_imported:
+            self.import_ressources()
+
+        if antigravity: # If gravity is reversed: vertically flipped image
+            return self.face_image_instance_flipped
+        return self.face_image_instance
 
     def position_in_block_getter(self):
         '''
@@ -129,8 +155,6 @@ class Zardow(Entity):
 
         self.walk_cycle_images = ['Face.png','1.png','2.png','3.png','4.png','5.png','6.png','7.png','8.png','9.png']
         self.face_image = 'Face.png'
-
-        self.import_ressources()
         
     def get_image(self, antigravity = False):
         '''
@@ -141,28 +165,35 @@ class Zardow(Entity):
         Parameters: see Entity.get_image
         Returns: see Entity.get_image
         '''
+        if not self.ressources_imported:
+            self.import_ressources()
+
+        if antigravity: # If gravity is reversed: vertically flipped images
+            images_left = self.walk_cycle_images_instances_left_flipped
+            images_right = self.walk_cycle_images_instances_right_flipped
+        else:
+            images_left = self.walk_cycle_images_instances_left
+            images_right = self.walk_cycle_images_instances_right
+
         if self.velocity > 0: # Moving
 
             if self.direction == Direction.LEFT: #elif?
-                walking_cycle_offset = int(self.position_in_block / (1 / float(len(self.walk_cycle_images_instances_left)-1)))+1
-                walking_cycle_offset = walking_cycle_offset % len(self.walk_cycle_images_instances_right)
-                image = self.walk_cycle_images_instances_left[walking_cycle_offset]
+                walking_cycle_offset = int(self.position_in_block / (1 / float(len(images_left)-1)))+1
+                walking_cycle_offset = walking_cycle_offset % len(images_right)
+                image = images_left[walking_cycle_offset]
 
             elif self.direction == Direction.RIGHT:
-                walking_cycle_offset = int(self.position_in_block / (1 / float(len(self.walk_cycle_images_instances_right)-1)))+1
-                walking_cycle_offset = walking_cycle_offset % len(self.walk_cycle_images_instances_right)
-                image = self.walk_cycle_images_instances_right[walking_cycle_offset]
+                walking_cycle_offset = int(self.position_in_block / (1 / float(len(images_right)-1)))+1
+                walking_cycle_offset = walking_cycle_offset % len(images_right)
+                image = images_right[walking_cycle_offset]
 
         else: # Stopped
 
             if self.direction == Direction.LEFT:
-                image = self.walk_cycle_images_instances_left[0]
+                image = images_left[0]
 
             elif self.direction == Direction.RIGHT:
-                image = self.walk_cycle_images_instances_right[0]
-
-        if antigravity: # If gravity is reversed: flip image vertically
-            image = pygame.transform.flip(image, False, True)
+                image = images_right[0]
 
         return image
 
@@ -191,8 +222,6 @@ class Rocket(Entity):
         self.face_image = 'Standing.png'
         self.alternate_image = 'WithZardow.png'
 
-        self.import_ressources()
-
     def get_image(self, antigravity = False):
         '''
         Overriding Entity.get_image
@@ -202,6 +231,8 @@ class Rocket(Entity):
         Parameters: see Entity.get_image
         Returns: see Entity.get_image
         '''
+        if not self.ressources_imported:
+            self.import_ressources()
 
         if self.zardow_is_in:
             return self.alternate_image_instance
@@ -214,21 +245,18 @@ class Rocket(Entity):
         
         Rocket specific behaviour:
             If Zardow is in the rocket, make it take-off (increase vertical position by 0.1 every fps)
+            The Simulation reports it with a ROCKET_TAKING_OFF event, on which the game shows the smoke.
         
         Parameters: see Entity.update
         Returns: see Entity.update
         '''
         if self.zardow_is_in:
             self.position = (self.position[0] + 0.1, self.position[1] + 1)
-            
-            smoke_textures = Effects.getTexturesFromDirectory('Ressources/Particles/SmokeAndFire')
-            smoke_effect = Effects.UniformEffect(((self.position[0] + 0.3) * instance.tile_side_size, (instance.mapsize[1] - self.position[1]) * instance.tile_side_size), smoke_textures, quantity = 2, radius_max = 3, age_max = 3, textures_alternating_mode = Effects.TextureAlternatingMode.RANDOMLY)
-            instance.effects.append(smoke_effect)
                         
             if max(self.position) > 19: # If rocket out of the map
                 self.position = (18, 18)
                 self.size = (0, 0) # Invisible
-                self.import_ressources()
+                self.ressources_imported = False # Re-import images at the new size
                 self.zardow_is_in = False # End animation
 
 
@@ -253,8 +281,6 @@ class MovingBox(Entity):
 
         self.face_image = 'Face.png'
 
-        self.import_ressources()
-
     def get_image(self, antigravity = False):
         '''
         Overriding Entity.get_image
@@ -264,4 +290,7 @@ class MovingBox(Entity):
         Parameters: see Entity.get_image
         Returns: see Entity.get_image
         '''
+        if not self.ressources_imported:
+            self.import_ressources()
+
         return self.face_image_instance
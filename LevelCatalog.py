@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##################################################
+################################################## LEVELCATALOG.PY
+##################################################
+
+import os
+import json
+
+
+class LevelCatalog(object):
+    '''
+    The entries of a level pack file (LevelPack.json), read once and read again only when the file is modified.
+    An entry is a level ({'environment', 'name', 'path'}) or an animation ({'animation', 'images', 'path', 'music'}).
+    Entries are indexed by path and by position, so finding the entry following a level doesn't depend on the size of the pack.
+    '''
+    def __init__(self, path = 'LevelPack.json'):
+        '''
+        Parameters:
+            path (str) : The path of the level pack file
+        '''
+        self.path = path
+
+        self.levels = [] # Every entry, in the order of the file
+        self.positions = {} # {path: position of its first entry in self.levels}
+        self.signature = None # (mtime, size) of the file when it was read
+
+    def refresh(self):
+        '''
+        Read the file again if it has been modified since the last time it was read.
+        Returns:
+            bool : True if the file has been read
+        '''
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return False
+
+        with open(self.path,'r') as levelPackJson:
+            levels = json.loads(levelPackJson.read())['Levels']
+
+        self.positions = {}
+        for position,level in enumerate(levels):
+            self.positions.setdefault(level['path'], position)
+
+        self.levels = levels
+        self.signature = signature
+        return True
+
+    def get_levels(self):
+        '''
+        Returns:
+            [dict, ...] : Every entry of the pack, up to date
+        '''
+        self.refresh()
+        return self.levels
+
+    def index(self, path):
+        '''
+        Parameters:
+            path (str) : The path of an entry
+        Returns:
+            int : The position of the entry in the pack, None if it is not in the pack
+        '''
+        self.refresh()
+        return self.positions.get(path)
+
+    def get_next(self, path):
+        '''
+        Parameters:
+            path (str) : The path of an entry
+        Returns:
+            dict : The entry following it, None if it is the last one or is not in the pack
+        '''
+        position = self.index(path)
+        if position is None or position + 1 >= len(self.levels):
+            return None
+        return self.levels[position + 1]
@@ -21,60 +21,127 @@ class LevelChooser(pygame.Surface):
         pygame.Surface.__init__(self,size = (size, size))
         self.scroll_y = 0
 
-        self.items = items
-
         background = load_image('Ressources/Backgrounds/earth.png')
         width = int(size * (background.get_width()/800))
         self.background = pygame.transform.scale(background, (width, size))
         self.button_image = load_image('Ressources/Hud/choiceButton.png', (500, 60))
 
-        self.font_baloo32 = pygame.font.Font('Ressources/Fonts/Baloo.ttf', 32)
+        self.title = render_text('Choose a level:', 32)
 
-        self.rects = []
+        self.row_height = size / 7
+        self.button_size = (500, 60)
+
+        self.buttons = {} # {environment: button image}
+        self.labels = TextCache(loadedFonts, capacity = 32) # Rendered names of the levels, not in renderedTexts so big packs don't push the other texts out of it. About 8 rows are visible at once, the margin keeps the names around them while scrolling
+
+        self.rows = [] # [index of the item in self.items, ...] of the levels (animations are not shown), in the order they are shown
+        self.rects = [] # [(rect, index of the item), ...] of the buttons drawn at the last draw
+
+        self.needs_redraw = True # False while self shows the current items at the current scroll_y
 
         self.scrolling_speed = 10 # scrolling_y delta
 
+        self.items = items
+
+    @property
+    def items(self):
+        return self._items
+
+    @items.setter
+    def items(self, items):
+        self._items = items
+        self.rows = [index for index,item in enumerate(items) if 'animation' not in item]
+        self.needs_redraw = True
+
+    def get_button(self, item):
+        '''
+        Parameters:
+            item (dict) : A level of self.items
+        Returns:
+            pygame.Surface : The button of the level, without its name
+        '''
+        environment = item['environment']
+        if environment not in self.buttons:
+            self.buttons[environment] = load_image('Ressources/Menu/%s.png'%environment, self.button_size)
+        return self.buttons[environment]
+
+    def get_label(self, item):
+        '''
+        Parameters:
+            item (dict) : A level of self.items
+        Returns:
+            pygame.Surface : The name of the level, rendered
+        '''
+        return self.labels.render(item['name'], 32, (255, 255, 255), 'Ressources/Fonts/Baloo.ttf')
+
+    def get_row_y(self, row):
+        '''
+        Returns:
+            float : The vertical position of the button of a row, at the current scroll_y
+        '''
+        return 64 + (32 - self.scroll_y) + (row * self.row_height)
+
+    def get_visible_rows(self):
+        '''
+        Returns:
+            range : The rows whose button is (partially) inside the level selector at the current scroll_y
+        '''
+        first = max(0, int((self.scroll_y - 96 - self.button_size[1]) // self.row_height))
+        last = min(len(self.rows), int((self.scroll_y - 96 + self.get_height()) // self.row_height) + 1)
+        return range(first, last)
+
     def move(self, direction):
         '''
         Called when the player scoll the menu up or down.
         Parameters:
             direction (int) : Positive number if scroll up (go down), negative number if scroll down (go up)
         '''
-        number_of_levels = len(list(filter(lambda d: 'animation' not in d, self.items)))
-        self.scroll_y += direction * self.scrolling_speed
-        self.scroll_y = max(0, self.scroll_y)
-        self.scroll_y = min((number_of_levels-7)*(self.get_height() / 7) + 64, self.scroll_y)
+        number_of_levels = len(self.rows)
+        scroll_y = self.scroll_y + direction * self.scrolling_speed
+        scroll_y = max(0, scroll_y)
+        scroll_y = min((number_of_levels-7)*(self.get_height() / 7) + 64, scroll_y)
+
+        if scroll_y != self.scroll_y:
+            self.scroll_y = scroll_y
+            self.needs_redraw = True
 
     def draw(self, surface):
         '''
         Render the level selector and show it on the specified surface.
+        Only the visible buttons are drawn, and nothing is drawn again until the player scrolls or the items change.
+        Returns:
+            bool : True if the level selector has been drawn, False if the surface already shows it
         '''
+        if not self.needs_redraw:
+            return False
+
         self.blit(self.background, (0, 0))
         self.rects = []
 
         texty = (40 - self.scroll_y)
-        text = self.font_baloo32.render('Choose a level:', True, (255, 255, 255))
-        text_rect = text.get_rect( center=(self.get_width() / 2, texty) )
-        self.blit(text, text_rect)
-
-        for index,item in enumerate(self.items):
-            if 'animation' not in item:
-                button_image = load_image('Ressources/Menu/%s.png'%item['environment'], (500, 60))
+        text_rect = self.title.get_rect( center=(self.get_width() / 2, texty) )
+        self.blit(self.title, text_rect)
 
-                x = self.get_width() / 2 - button_image.get_width() / 2
-                y = 64 + (32 - self.scroll_y) + (index * (self.get_height() / 7))
+        for row in self.get_visible_rows():
+            index = self.rows[row]
+            item = self.items[index]
+            button_image = self.get_button(item)
 
+            x = self.get_width() / 2 - button_image.get_width() / 2
+            y = self.get_row_y(row)
 
-                self.blit(button_image, (x, y))
+            self.blit(button_image, (x, y))
 
-                text = self.font_baloo32.render(item['name'], True, (255, 255, 255))
-                text_rect = text.get_rect( center=(self.get_width() / 2,(y + (button_image.get_height() / 2) )))
-                self.blit(text, text_rect)
+            text = self.get_label(item)
+            text_rect = text.get_rect( center=(self.get_width() / 2,(y + (button_image.get_height() / 2) )))
+            self.blit(text, text_rect)
 
-                rect = pygame.Rect(x, y, button_image.get_width(), button_image.get_height())
-                self.rects.append((rect, index))
+            rect = pygame.Rect(x, y, button_image.get_width(), button_image.get_height())
+            self.rects.append((rect, index))
 
         surface.blit(self,(0,0))
+        self.needs_redraw = False
+        return True
 
     def select(self, position):
         '''
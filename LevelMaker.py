@@ -33,8 +33,7 @@ class InputBox:
 		self.rect = pygame.Rect(x, y, w, h)
 		self.color = (255,255,255)
 		self.text = text
-		self.font = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 64)
-		self.txt_surface = self.font.render(text, True, self.color)
+		self.txt_surface = render_text(text, 64, self.color)
 		self.active = False
 		self.action = None
 
@@ -51,7 +50,7 @@ class InputBox:
 					if character not in ('/','.','*','\\'):
 						self.text += event.unicode
 				# Re-render the text.
-				self.txt_surface = self.font.render(self.text, True, self.color)
+				self.txt_surface = render_text(self.text, 64, self.color)
 
 	def update(self):
 		# Resize the box if the text is too long.
@@ -136,17 +135,13 @@ class LevelMaker(object):
 			print ('Aucune sortie audio')
 
 		self.surface = pygame.display.set_mode(self.window_size)
+		convert_loaded_images() # Images are converted to the pixel format of the display
 		pygame.display.set_caption(self.window_title)
 
 		self.surface.fill(self.bgcolor)
 
 		pygame.key.set_repeat(self.key_repeat_time, self.key_repeat_time)
 
-		self.font_baloo48 = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 48)
-		self.font_baloo32 = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 32)
-		self.font_baloo24 = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 24)
-		self.font_baloo16 = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 16)
-
 		#self.sound_channel = pygame.mixer.Channel(5)
 
 		self.toolbox = Toolbox.Toolbox()
@@ -156,49 +151,82 @@ class LevelMaker(object):
 		self.input_box = InputBox(self.surface.get_width() / 2 - 400, self.surface.get_height() / 2 - 100, 800, 100)
 		self.input_box.action = self.save_level
 
+		# The map and the item chooser are drawn on layers, redrawn only when they change
+		self.build_map_layer()
+		self.build_palette_layer()
+
 		self.refresh_display()
 
 
-	def refresh_display(self):
+	def build_map_layer(self):
+		'''
+		Draw the background colour of the environment and every tile of the map on the map layer.
+		'''
 		if self.environment == 'earth':
 			self.bgcolor = (0,255,255)
 		elif self.environment == "space":
 			self.bgcolor = (50,50,255)
-		self.surface.fill(self.bgcolor) # Reset display
-
-		# Dimension
 
+		self.map_layer = pygame.Surface((len(self.dimension) * self.tile_side_size, len(self.dimension[0]) * self.tile_side_size)).convert()
+		self.map_layer.fill(self.bgcolor)
+		self.map_layer_environment = self.environment
 
 		for x,subdim in enumerate(self.dimension):
-			for y,blocId in reversedEnumerate(subdim):
-				bloc = Tiles.identifiers[blocId](size = (self.tile_side_size, self.tile_side_size))
-				bloc.position = (x * self.tile_side_size, y * self.tile_side_size)
-				rect = bloc.position + bloc.rect
-				image = bloc.get_describing_image((self.tile_side_size, self.tile_side_size))
-				self.surface.blit(image, rect)
+			for y in range(len(subdim)):
+				self.draw_map_cell(x, y)
 
-		# Item Chooser
-		pygame.draw.rect(self.surface,(204,255,255),(800,0,800,800))
+	def draw_map_cell(self, x, y):
+		'''
+		Draw a tile of the map on the map layer (when it is painted).
+		Parameters:
+			x (int) : The column of the tile
+			y (int) : The row of the tile, from the bottom
+		'''
+		rect = pygame.Rect(x * self.tile_side_size, (len(self.dimension[x]) - y - 1) * self.tile_side_size, self.tile_side_size, self.tile_side_size)
+		self.map_layer.fill(self.bgcolor, rect)
+
+		image = Tiles.get_descriptor(Tiles.identifiers[self.dimension[x][y]], (self.tile_side_size, self.tile_side_size)).describing_image
+		self.map_layer.blit(image, rect)
+
+	def build_palette_layer(self):
+		'''
+		Draw the item chooser (every tile type, and the selected one) on the palette layer.
+		'''
+		self.palette_layer = pygame.Surface((800,800)).convert()
+		self.palette_layer.fill((204,255,255))
+		self.palette_layer_selected_id = self.selectedId
 
 		columnSelected = self.selectedId % 7
 		rowSelected = int(self.selectedId / 7)
-		xSelected = 800 + 65 + columnSelected * (self.tile_side_size + 65) - 16
+		xSelected = 65 + columnSelected * (self.tile_side_size + 65) - 16
 		ySelected = 65 + rowSelected * (self.tile_side_size + 65) - 16
 
-		pygame.draw.rect(self.surface,(220,220,220),(xSelected,ySelected,self.tile_side_size + 32,self.tile_side_size + 32))
+		pygame.draw.rect(self.palette_layer,(220,220,220),(xSelected,ySelected,self.tile_side_size + 32,self.tile_side_size + 32))
 
+		tile_size = (self.tile_side_size, self.tile_side_size)
 		for index,item in Tiles.identifiers.items():
-			instance = item(size = (self.tile_side_size, self.tile_side_size))
 			index_x = index % 7
 			index_y = int(index / 7)
-			x = 800 + 65 + index_x * (self.tile_side_size + 65)
+			x = 65 + index_x * (self.tile_side_size + 65)
 			y = 65 + index_y * (self.tile_side_size + 65)
-			instance.position = (x, y)
-			rect = instance.position + (self.tile_side_size,self.tile_side_size)
-			image = instance.get_describing_image((self.tile_side_size, self.tile_side_size))
-			self.surface.blit(image, rect)
-			
-		
+			image = Tiles.get_descriptor(item, tile_size).describing_image
+			self.palette_layer.blit(image, (x, y))
+
+
+	def refresh_display(self):
+		'''
+		Draw the whole editor and update the display. Only called when something changed (see mainloop).
+		'''
+		if self.map_layer_environment != self.environment:
+			self.build_map_layer()
+		if self.palette_layer_selected_id != self.selectedId:
+			self.build_palette_layer()
+
+		# Dimension
+		self.surface.blit(self.map_layer, (0, 0))
+
+		# Item Chooser
+		self.surface.blit(self.palette_layer, (800, 0))
 
 
 		# Properties
@@ -265,7 +293,7 @@ class LevelMaker(object):
 		antimatterImage = load_image('Ressources/Tiles/antimatter.png',(50,50))
 		self.surface.blit(antimatterImage, (650, 875))
 
-		antimatter_text = self.font_baloo32.render(str(self.antimatter_number), True, (255,255,255))
+		antimatter_text = render_text(str(self.antimatter_number), 32)
 		antimatter_text_rect = antimatter_text.get_rect(center=(625, 900))
 		self.surface.blit(antimatter_text, antimatter_text_rect)
 		
@@ -284,12 +312,12 @@ class LevelMaker(object):
 
 
 		# Save button
-		save_button = self.font_baloo48.render('Save', True, (255,255,255))
+		save_button = render_text('Save', 48)
 		self.save_button_rect = save_button.get_rect(center=(1500, 850))
 		self.surface.blit(save_button, self.save_button_rect)
 
 		# Play button
-		play_button = self.font_baloo32.render('Play', True, (255,255,255))
+		play_button = render_text('Play', 32)
 		self.play_button_rect = play_button.get_rect(center=(1500, 950))
 		self.surface.blit(play_button, self.play_button_rect)
 
@@ -312,9 +340,12 @@ class LevelMaker(object):
 
 
 	def mainloop(self):
+		'''
+		Wait for events, apply them to the level, and redraw the editor only if something changed (at most 60 times per second).
+		Nothing is done while the editor is idle.
+		'''
 		#pygame.display.flip()
 
-		time_elapsed_since_last_action = 0
 		self.clock = pygame.time.Clock()
 
 		pause = False # For debugging
@@ -322,93 +353,128 @@ class LevelMaker(object):
 		just_clicked = False
 
 		while self.running:
-			self.mouse_position = pygame.mouse.get_pos()
-			for event in pygame.event.get():
+			needs_redraw = False
+
+			for event in [pygame.event.wait()] + pygame.event.get(): # Sleep until something happens
 
 
 				if event.type == pygame.QUIT: # Quit event (sent by red-cross-button)
 					print ('Quit event')
 					self.running = False
 					pygame.quit()
-					break
+					return
 
 				if self.is_typing_level_name:
 					self.input_box.handle_event(event)
-					self.refresh_display()
-
-
-			mouse_click = bool(sum(pygame.mouse.get_pressed()))
-			if mouse_click: # Mouse press
-				mouse_position = pygame.mouse.get_pos()
-				x, y = mouse_position
+					if not self.running: # Level saved
+						return
+					needs_redraw = True
 
-				if y < 800:
+				if event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 2, 3): # Mouse press (not the wheel)
+					if event.pos[1] < 800:
+						needs_redraw |= self.edit(event.pos, True)
+					else:
+						just_clicked = True
 
-					if self.toolbox.rect.collidepoint(mouse_position):
-						if self.selectedId:
-							self.toolbox.items.append(Tiles.identifiers[self.selectedId])
-							self.toolbox.selected_slot = None
-						else:
-							self.toolbox.items = self.toolbox.items[:-1]
-							self.toolbox.selected_slot = None
+				elif event.type == pygame.MOUSEMOTION and any(event.buttons): # Painting
+					if event.pos[1] < 800:
+						needs_redraw |= self.edit(event.pos, False)
 
-					elif x < 800:
-						xC = int(x / self.tile_side_size)
-						yC = self.mapsize[1] - int(y / self.tile_side_size) -1
-						self.dimension[xC][yC] = self.selectedId
+				elif event.type == pygame.MOUSEBUTTONUP and event.button in (1, 2, 3) and just_clicked: # Mouse release, on the properties
+					self.click_property(event.pos)
+					just_clicked = False
+					if not self.running: # Level saved to be played
+						return
+					needs_redraw = True
 
-					else:
-						column = int((x - 800 - 65) / (self.tile_side_size + 65))
-						row = int((y - 65) / (self.tile_side_size + 65))
-						new_selected = row * 7 + column
-						if new_selected < len(Tiles.identifiers):
-							self.selectedId = new_selected
+			if needs_redraw:
+				self.refresh_display()
+				self.clock.tick(60)
 
-				else:
-					just_clicked = True
+	def edit(self, mouse_position, pressed):
+		'''
+		Called when the mouse is pressed, or moved while pressed, over the map, the item chooser or the toolbox.
+		Parameters:
+			mouse_position ( tuple(x, y) ) : The position of the mouse
+			pressed (bool) : True if the mouse button has just been pressed, False if the mouse moved while pressed
+		Returns:
+			bool : True if something changed and the editor needs to be redrawn
+		'''
+		x, y = mouse_position
+
+		if self.toolbox.rect.collidepoint(mouse_position):
+			if not pressed: # One item per click
+				return False
+			if self.selectedId:
+				self.toolbox.items.append(Tiles.identifiers[self.selectedId])
+				self.toolbox.selected_slot = None
 			else:
-				if just_clicked:
-					if self.zardow_left_button_rect.collidepoint(mouse_position):
-						self.zardow_position = (self.zardow_position[0]-1,self.zardow_position[1])
-					elif self.zardow_right_button_rect.collidepoint(mouse_position):
-						self.zardow_position = (self.zardow_position[0]+1,self.zardow_position[1])
-					elif self.zardow_up_button_rect.collidepoint(mouse_position):
-						self.zardow_position = (self.zardow_position[0],self.zardow_position[1]+1)
-					elif self.zardow_down_button_rect.collidepoint(mouse_position):
-						self.zardow_position = (self.zardow_position[0],self.zardow_position[1]-1)
-
-					if self.zardow_facing_left_button_rect.collidepoint(mouse_position):
-						self.zardow_orientation = 'left'
-					elif self.zardow_facing_right_button_rect.collidepoint(mouse_position):
-						self.zardow_orientation = 'right'
-
-					if self.rocket_left_button_rect.collidepoint(mouse_position):
-						self.rocket_position = (self.rocket_position[0]-1,self.rocket_position[1])
-					elif self.rocket_right_button_rect.collidepoint(mouse_position):
-						self.rocket_position = (self.rocket_position[0]+1,self.rocket_position[1])
-					elif self.rocket_up_button_rect.collidepoint(mouse_position):
-						self.rocket_position = (self.rocket_position[0],self.rocket_position[1]+1)
-					elif self.rocket_down_button_rect.collidepoint(mouse_position):
-						self.rocket_position = (self.rocket_position[0],self.rocket_position[1]-1)
-
-					if self.antimatter_more_button_rect.collidepoint(mouse_position):
-						self.antimatter_number += 1
-					elif self.antimatter_less_button_rect.collidepoint(mouse_position):
-						self.antimatter_number -=1
-
-					if self.space_button_rect.collidepoint(mouse_position):
-						self.environment = "space"
-					elif self.earth_button_rect.collidepoint(mouse_position):
-						self.environment = "earth"
-
-					if self.save_button_rect.collidepoint(mouse_position):
-						self.ask_for_saving_level()
-
-					if self.play_button_rect.collidepoint(mouse_position):
-						self.save_level('tmp')
-					just_clicked = False
+				self.toolbox.items = self.toolbox.items[:-1]
+				self.toolbox.selected_slot = None
+			return True
+
+		elif x < 800:
+			xC = int(x / self.tile_side_size)
+			yC = self.mapsize[1] - int(y / self.tile_side_size) -1
+			if self.dimension[xC][yC] == self.selectedId:
+				return False
+			self.dimension[xC][yC] = self.selectedId
+			self.draw_map_cell(xC, yC)
+			return True
 
-			self.refresh_display()
+		else:
+			column = int((x - 800 - 65) / (self.tile_side_size + 65))
+			row = int((y - 65) / (self.tile_side_size + 65))
+			new_selected = row * 7 + column
+			if new_selected < len(Tiles.identifiers) and new_selected != self.selectedId:
+				self.selectedId = new_selected
+				return True
+			return False
+
+	def click_property(self, mouse_position):
+		'''
+		Called when the mouse is released after a click on the properties (under the map).
+		Parameters:
+			mouse_position ( tuple(x, y) ) : The position of the mouse
+		'''
+		if self.zardow_left_button_rect.collidepoint(mouse_position):
+			self.zardow_position = (self.zardow_position[0]-1,self.zardow_position[1])
+		elif self.zardow_right_button_rect.collidepoint(mouse_position):
+			self.zardow_position = (self.zardow_position[0]+1,self.zardow_position[1])
+		elif self.zardow_up_button_rect.collidepoint(mouse_position):
+			self.zardow_position = (self.zardow_position[0],self.zardow_position[1]+1)
+		elif self.zardow_down_button_rect.collidepoint(mouse_position):
+			self.zardow_position = (self.zardow_position[0],self.zardow_position[1]-1)
+
+		if self.zardow_facing_left_button_rect.collidepoint(mouse_position):
+			self.zardow_orientation = 'left'
+		elif self.zardow_facing_right_button_rect.collidepoint(mouse_position):
+			self.zardow_orientation = 'right'
+
+		if self.rocket_left_button_rect.collidepoint(mouse_position):
+			self.rocket_position = (self.rocket_position[0]-1,self.rocket_position[1])
+		elif self.rocket_right_button_rect.collidepoint(mouse_position):
+			self.rocket_position = (self.rocket_position[0]+1,self.rocket_position[1])
+		elif self.rocket_up_button_rect.collidepoint(mouse_position):
+			self.rocket_position = (self.rocket_position[0],self.rocket_position[1]+1)
+		elif self.rocket_down_button_rect.collidepoint(mouse_position):
+			self.rocket_position = (self.rocket_position[0],self.rocket_position[1]-1)
+
+		if self.antimatter_more_button_rect.collidepoint(mouse_position):
+			self.antimatter_number += 1
+		elif self.antimatter_less_button_rect.collidepoint(mouse_position):
+			self.antimatter_number -=1
+
+		if self.space_button_rect.collidepoint(mouse_position):
+			self.environment = "space"
+		elif self.earth_button_rect.collidepoint(mouse_position):
+			self.environment = "earth"
+
+		if self.save_button_rect.collidepoint(mouse_position):
+			self.ask_for_saving_level()
+
+		if self.play_button_rect.collidepoint(mouse_position):
+			self.save_level('tmp')
 
 	def ask_for_saving_level(self):
 			self.is_typing_level_name = True
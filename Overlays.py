@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##################################################
+################################################## OVERLAYS.PY
+##################################################
+
+import pygame
+
+from utilities import *
+
+
+class Button(object):
+    '''
+    A button of an overlay, with its image and the image shown while the mouse is over it.
+    '''
+    def __init__(self, rect, image_path, hover_image_path = None):
+        '''
+        Parameters:
+            rect (pygame.Rect) : The area of the window covered by the button
+            image_path (str) : The path of the image of the button
+            hover_image_path (str) : The path of the image shown while the mouse is over the button, None if it doesn't change
+        '''
+        self.rect = rect
+        self.image = load_image(image_path, rect.size)
+        self.hover_image = load_image(hover_image_path, rect.size) if hover_image_path else self.image
+
+    def is_hovered(self, mouse_position):
+        '''
+        Returns:
+            bool : True if the mouse is over the button
+        '''
+        return self.rect.collidepoint(mouse_position)
+
+    def get_image(self, hovered):
+        '''
+        Returns:
+            pygame.Surface : The image of the button, depending on the mouse being over it or not
+        '''
+        return self.hover_image if hovered else self.image
+
+
+class Overlay(object):
+    '''
+    A screen drawn above the level (menu, "You Win", pause, in-game buttons), made of layers built once for a window size:
+    an optional dim layer darkening the level, an optional title, and buttons.
+    '''
+    def __init__(self, window_size, dim = False, title = None, buttons = []):
+        '''
+        Parameters:
+            window_size (int) : The width and height of the window
+            dim (bool) : If True, the level is darkened under the overlay
+            title ( tuple(pygame.Surface, tuple(x, y)) ) : The title image and its position, None for no title
+            buttons ( [Button, ...] ) : The buttons, drawn in this order
+        '''
+        self.dim_layer = None
+        if dim:
+            self.dim_layer = pygame.Surface((window_size, window_size))
+            if pygame.display.get_surface() is not None:
+                self.dim_layer = self.dim_layer.convert()
+            self.dim_layer.fill((0,0,0))
+            self.dim_layer.set_alpha(128)
+
+        self.title = title
+        self.buttons = buttons
+
+    def get_state(self, mouse_position):
+        '''
+        Returns:
+            tuple : Everything that can change the drawing of the overlay (which buttons the mouse is over)
+        '''
+        return tuple(button.is_hovered(mouse_position) for button in self.buttons)
+
+    def draw(self, surface, mouse_position):
+        '''
+        Draw the overlay on a surface, above what it already shows.
+        Parameters:
+            surface (pygame.Surface) : The surface to draw on (the window)
+            mouse_position ( tuple(x, y) ) : The position of the mouse, to show the hovered buttons
+        Returns:
+            [pygame.Rect, ...] : The areas of the surface covered by the overlay
+        '''
+        drawn_rects = []
+
+        if self.dim_layer is not None:
+            drawn_rects.append(surface.blit(self.dim_layer, (0, 0)))
+
+        if self.title is not None:
+            drawn_rects.append(surface.blit(*self.title))
+
+        for button, hovered in zip(self.buttons, self.get_state(mouse_position)):
+            drawn_rects.append(surface.blit(button.get_image(hovered), button.rect))
+
+        return drawn_rects
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##################################################
+################################################## PREFETCHER.PY
+##################################################
+
+import threading
+import collections
+
+import pygame
+
+import Simulation
+from utilities import *
+
+
+PreparedLevel = collections.namedtuple('PreparedLevel', ['level', 'simulation', 'background', 'sprites']) # Everything load_level needs, images are decoded and scaled but not converted
+
+
+class LevelPrefetcher(object):
+    '''
+    Prepares a level on a worker thread before the player enters it (while the "You Win" screen shows, or when the mouse is over a level of the level chooser),
+    so Zardow.load_level only has to take the prepared level instead of importing it, building its simulation and decoding its background.
+    Only the latest requested level is prepared: requests made while the worker is busy replace each other.
+    '''
+    def __init__(self, window_size, update_frequency = 20, capacity = 2):
+        '''
+        Parameters:
+            window_size (int) : The size of the game window, to scale the backgrounds
+            update_frequency (int) : Number of simulation steps per second
+            capacity (int) : Number of prepared levels kept until they are taken (the oldest ones are dropped)
+        '''
+        self.window_size = window_size
+        self.update_frequency = update_frequency
+        self.capacity = capacity
+
+        self.condition = threading.Condition()
+        self.prepared = collections.OrderedDict() # {levelName: PreparedLevel, or None if it couldn't be prepared}
+        self.wanted = None # Name of the next level to prepare
+        self.working_on = None # Name of the level being prepared
+        self.thread = None # The worker thread, started at the first request
+
+    def prefetch(self, levelName):
+        '''
+        Ask the worker to prepare a level, returns immediately.
+        Parameters:
+            levelName (str) : The name of the level
+        '''
+        with self.condition:
+            if levelName in self.prepared or levelName == self.working_on:
+                return
+
+            self.wanted = levelName
+            self.condition.notify_all()
+
+            if self.thread is None:
+                self.thread = threading.Thread(target = self.work, name = 'LevelPrefetcher', daemon = True)
+                self.thread.start()
+
+    def take(self, levelName):
+        '''
+        Get a prepared level (waiting for the worker if it is preparing it right now). A level can only be taken once.
+        Parameters:
+            levelName (str) : The name of the level
+        Returns:
+            PreparedLevel : The prepared level, None if it hasn't been requested or couldn't be prepared
+        '''
+        with self.condition:
+            if self.wanted == levelName: # Not started yet: the caller will be as fast as the worker
+                self.wanted = None
+
+            while self.working_on == levelName:
+                self.condition.wait()
+
+            return self.prepared.pop(levelName, None)
+
+    def work(self):
+        '''
+        Loop of the worker thread.
+        '''
+        while True:
+            with self.condition:
+                while self.wanted is None:
+                    self.condition.wait()
+                levelName, self.wanted = self.wanted, None
+                self.working_on = levelName
+
+            try:
+                prepared = self.prepare(levelName)
+            except Exception as e:
+                print ('Error "{e}" while preparing the level {level}'.format(e = e, level = levelName))
+                prepared = None
+
+            with self.condition:
+                self.prepared[levelName] = prepared
+                while len(self.prepared) > self.capacity:
+                    self.prepared.popitem(last = False)
+                self.working_on = None
+                self.condition.notify_all()
+
+    def prepare(self, levelName):
+        '''
+        Import a level, build its simulation, and decode its background and the sprites of its entities. Executed on the worker thread, so it never uses the display.
+        Parameters:
+            levelName (str) : The name of the level
+        Returns:
+            PreparedLevel : The prepared level
+        '''
+        level = import_level_as_module(levelName)
+        simulation = Simulation.Simulation(level, self.update_frequency)
+
+        background = decodedImages.load('Ressources/Backgrounds/'+level.background)
+        width = int(self.window_size * (background.get_width()/800))
+        background = pygame.transform.scale(background, (width, self.window_size))
+
+        sprites = {} # {(path, size): decoded image}, imported by load_level (see utilities.import_decoded_image)
+        for entity in simulation.entities:
+            for path, size in entity.get_ressources():
+                if (path, size) not in sprites:
+                    sprites[(path, size)] = decodedImages.load(path, size)
+
+        return PreparedLevel(level, simulation, background, sprites)
@@ -0,0 +1,496 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##################################################
+################################################## SIMULATION.PY
+##################################################
+
+import math
+import copy
+import collections
+
+import numpy
+
+import Tiles
+import Entities
+
+
+PORTALS = (Tiles.PortalBlue, Tiles.PortalGreen, Tiles.PortalRed) # One tile type per portal colour
+
+# Identifiers of the tiles the rules depend on (see Tiles.identifiers)
+AIR = Tiles.ids[Tiles.Air]
+ANTIMATTER = Tiles.ids[Tiles.Antimatter]
+TARGET = Tiles.ids[Tiles.TileTarget]
+LADDER = Tiles.ids[Tiles.Ladder]
+SPRING_LEFT = Tiles.ids[Tiles.SpringLeft]
+SPRING_RIGHT = Tiles.ids[Tiles.SpringRight]
+SPRING_LEFT_PRESSED = Tiles.ids[Tiles.SpringLeftPressed]
+SPRING_RIGHT_PRESSED = Tiles.ids[Tiles.SpringRightPressed]
+
+SPRINGS = (SPRING_LEFT, SPRING_LEFT_PRESSED, SPRING_RIGHT, SPRING_RIGHT_PRESSED)
+SPIKES = (Tiles.ids[Tiles.Spikes], Tiles.ids[Tiles.SpikesDown])
+BUTTONS = (Tiles.ids[Tiles.ButtonUp], Tiles.ids[Tiles.ButtonDown])
+
+# Tile categories, a boolean mask of the tilemap is kept up to date for each of them
+CATEGORIES = {
+    'traversable': tuple(identifier for identifier, tileType in Tiles.identifiers.items() if tileType.traversable),
+    'ladder': (LADDER,),
+    'spring': SPRINGS,
+    'spike': SPIKES,
+    'portal': tuple(Tiles.ids[portalType] for portalType in PORTALS),
+    'button': BUTTONS,
+}
+
+# CATEGORY_TABLES[category][tileId] is True if the tile belongs to the category
+CATEGORY_TABLES = {category: numpy.isin(numpy.arange(len(Tiles.identifiers)), identifiers) for category, identifiers in CATEGORIES.items()}
+
+
+class EventType:
+    '''
+    Everything noticeable that happens in a Simulation is reported as an Event of one of these types.
+    The game plays sounds and shows particles for them, headless tools can simply ignore them.
+    '''
+    TILE_CHANGED = 0 # A tile of the tilemap has been replaced (attributes: coords, tile)
+    TILE_PLACED = 1 # A tile from the toolbox has been placed (attributes: coords, tile)
+    SPRING_RELEASED = 2 # An entity leaves a pressed spring (attributes: entity, coords)
+    TELEPORTED = 3 # An entity crossed a portal (attributes: entity, tile, origin, destination)
+    ANTIMATTER_COLLECTED = 4 # Zardow collected antimatter (attributes: coords, enough)
+    GRAVITY_REVERSED = 5 # An entity pressed an antigravity button (attributes: entity, anti_gravity)
+    BOX_BROKEN = 6 # A box has been broken (attributes: coords)
+    ENTITY_KILLED = 7 # An entity died (attributes: entity)
+    ROCKET_TAKING_OFF = 8 # The rocket moved up with Zardow inside (attributes: entity, position)
+    LEVEL_WON = 9 # Zardow reached the rocket with enough antimatter
+    LEVEL_LOST = 10 # Zardow or the rocket died, level has to be restarted
+
+
+class Event(object):
+    '''
+    An Event is reported by the Simulation instead of playing sounds or showing visual effects.
+    Its attributes depend on its type (see EventType).
+    '''
+    def __init__(self, type, **kwargs):
+        self.type = type
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        return '<Event %i>'%self.type
+
+
+class Simulation(object):
+    '''
+    The Simulation owns every game rule: the tilemap, entities, gravity, portals, springs, ladders, buttons and antimatter.
+    It never uses pygame (no display, no sound, no image), so it can run thousands of ticks per second in tools.
+    The Zardow game class only renders it and plays sounds from the reported events.
+    '''
+    def __init__(self, level, update_frequency = 20):
+        '''
+        Build a simulation from a loaded level.
+        Parameters:
+            level (module) : The level, as returned by utilities.import_level_as_module
+            update_frequency (int) : Number of steps per second, used by the gravity computation
+        '''
+        self.update_frequency = update_frequency
+
+        # Tilemap: a matrix of tile identifiers (see Tiles.identifiers), indexed as self.tiles[x, y]
+        self.tiles = numpy.array(level.dimension, dtype = numpy.uint8)
+        self.mapsize = self.tiles.shape # (20,20) for every level of the game
+
+        # One boolean matrix per tile category (see CATEGORIES), indexed like self.tiles
+        self.masks = {category: table[self.tiles] for category, table in CATEGORY_TABLES.items()}
+
+        # Portal index, so teleporting doesn't have to search the exit portal in the whole tilemap
+        self.portals = {portalType: [] for portalType in PORTALS} # {portalType: [(x, y), ...]}
+        self.portal_partners = {} # {(x, y) of a portal: (x, y) of its exit portal}
+        for portalType in PORTALS:
+            self.pair_portals(portalType, self.search_tiles(portalType))
+
+        self.needed_antimatter = level.antimatter
+        self.collected_antimatter = 0
+
+        # Entities managment
+        self.zardow_entity = Entities.Zardow()
+        self.zardow_entity.position = level.position
+        self.zardow_entity.direction = level.direction
+
+        self.rocket_entity = Entities.Rocket()
+        self.rocket_entity.position = level.rocketPosition
+
+        self.entities = [self.zardow_entity, self.rocket_entity] # Every entities actually in the game, default containing just the main character and the rocket
+
+        if hasattr(level, 'entities'):
+            self.entities.extend(map(copy.copy, level.entities)) # Copies: the level module stays untouched
+        self.moving_boxes = list(filter(lambda e: isinstance(e, Entities.MovingBox), self.entities))
+
+        # Occupancy index of moving boxes, so blocking checks don't have to loop over every box
+        self.moving_boxes_positions = {} # {box: position the box is indexed at}
+        self.moving_boxes_occupancy = collections.Counter() # {position: number of boxes at this position}
+        for box in self.moving_boxes:
+            self.index_moving_box(box)
+
+        self.anti_gravity = False
+
+        self.won = False
+        self.lost = False
+
+        self.ticks = 0 # Number of steps since the beginning of the level
+        self.events = [] # Events reported since the last pop_events()
+
+    def copy(self):
+        '''
+        Returns:
+            Simulation : An independent copy of the simulation, much cheaper than building it again from the level (used to restart a level)
+        '''
+        simulation = copy.copy(self)
+
+        simulation.tiles = self.tiles.copy()
+        simulation.masks = {category: mask.copy() for category, mask in self.masks.items()}
+        simulation.portals = {portalType: list(positions) for portalType, positions in self.portals.items()}
+        simulation.portal_partners = dict(self.portal_partners)
+
+        entities = {entity: copy.copy(entity) for entity in self.entities + [self.zardow_entity, self.rocket_entity]} # {entity: its copy}
+        simulation.entities = [entities[entity] for entity in self.entities]
+        simulation.zardow_entity = entities[self.zardow_entity]
+        simulation.rocket_entity = entities[self.rocket_entity]
+
+        simulation.moving_boxes = [entities[box] for box in self.moving_boxes]
+        simulation.moving_boxes_positions = {entities[box]: position for box, position in self.moving_boxes_positions.items()}
+        simulation.moving_boxes_occupancy = collections.Counter(self.moving_boxes_occupancy)
+
+        simulation.events = list(self.events)
+        return simulation
+
+    def get_state(self):
+        '''
+        Returns:
+            tuple : Everything the next steps depend on. Two simulations of the same level with equal states will behave the same way.
+        '''
+        entities = tuple((type(entity), entity.position, entity.direction, entity.velocity, entity.size, entity.falling_time, entity.start_y,
+                          entity.just_travelled_in_portal, entity.just_pressed_button, getattr(entity, 'zardow_is_in', False)) for entity in self.entities)
+        return (self.tiles.tobytes(), entities, self.anti_gravity, self.collected_antimatter, self.won, self.lost)
+
+    def report(self, type, **kwargs):
+        '''
+        Report an event that will be returned by the next pop_events (or step).
+        Parameters:
+            type (int) : One of the EventType values
+            **kwargs : The attributes of the event
+        '''
+        self.events.append(Event(type, **kwargs))
+
+    def pop_events(self):
+        '''
+        Returns:
+            [Event, ...] : Every events reported since the last call, in chronological order
+        '''
+        events = self.events
+        self.events = []
+        return events
+
+    def set_tile(self, coords, tileType):
+        '''
+        Replace a tile of the tilemap and report it.
+        Parameters:
+            coords ( tuple(x, y) ) : The coordinates of the tile
+            tileType (subclass of Tiles.Tile) : The new tile type
+        '''
+        x, y = coords
+        previous_tileType = self.get_tile((x, y))
+        tileId = Tiles.ids[tileType]
+        self.tiles[x, y] = tileId
+
+        for category, table in CATEGORY_TABLES.items():
+            self.masks[category][x, y] = table[tileId]
+
+        for portalType in (previous_tileType, tileType): # Keep the portal index up to date
+            if portalType in PORTALS:
+                positions = [position for position in self.portals[portalType] if position != (x, y)]
+                if tileType is portalType:
+                    positions.append((x, y))
+                self.pair_portals(portalType, positions)
+
+        self.report(EventType.TILE_CHANGED, coords = (x, y), tile = tileType)
+
+    def pair_portals(self, portalType, positions):
+        '''
+        Set the positions of every portal of a colour, and pair them in reading order (same order as the tilemap: by x, then by y).
+        The first portal leads to the second one and vice versa, the third one to the fourth one... A lonely portal leads nowhere.
+        Parameters:
+            portalType (subclass of Tiles.Tile) : The portal colour, one of PORTALS
+            positions ( [ (x, y), ...] ) : The positions of every portal of this colour
+        '''
+        for position in self.portals[portalType]:
+            self.portal_partners.pop(position, None)
+
+        positions = sorted(positions)
+        self.portals[portalType] = positions
+
+        for entry, exit in zip(positions[0::2], positions[1::2]):
+            self.portal_partners[entry] = exit
+            self.portal_partners[exit] = entry
+
+    def get_tile(self, coords):
+        '''
+        Returns:
+            (subclass of Tiles.Tile) : The type of the tile at coords
+        '''
+        return Tiles.identifiers[self.tiles.item(coords)]
+
+    def search_tiles(self, tileType):
+        '''
+        Search every tiles of the type tileType in the tilemap (like utilities.searchTypeInMatrix but for tile types)
+        Parameters:
+            tileType (subclass of Tiles.Tile) : the type to search
+        Returns:
+            [ (x, y), ...] : The coordinates of corresponding tiles, by x then by y
+        '''
+        return [tuple(coords) for coords in numpy.argwhere(self.tiles == Tiles.ids[tileType]).tolist()]
+
+    def can_place_tile(self, coords):
+        '''
+        Returns:
+            bool : True if a tile from the toolbox can be placed at coords (target tile not under Zardow)
+        '''
+        x, y = coords
+        return self.tiles.item(x, y) == TARGET and not (x == int(self.zardow_entity.position[0]) and y == int(self.zardow_entity.position[1]))
+
+    def place_tile(self, coords, tileType):
+        '''
+        Place a tile from the toolbox on a target tile.
+        Parameters:
+            coords ( tuple(x, y) ) : The coordinates of the target tile
+            tileType (subclass of Tiles.Tile) : The type of the placed tile
+        Returns:
+            bool : True if the tile has been placed
+        '''
+        if not self.can_place_tile(coords):
+            return False
+
+        self.set_tile(coords, tileType)
+        self.report(EventType.TILE_PLACED, coords = coords, tile = tileType)
+        return True
+
+    def break_boxes(self):
+        '''
+        Break every boxes of the level (what happens when the player press SPACE).
+        Returns:
+            bool : True if at least one box has been broken
+        '''
+        boxes = self.search_tiles(Tiles.Box)
+        for box_to_break_position in boxes:
+            self.set_tile(box_to_break_position, Tiles.Air)
+            self.report(EventType.BOX_BROKEN, coords = box_to_break_position)
+        return bool(boxes)
+
+    def kill_entity(self, entity):
+        '''
+        Kill an entity and remove it from the game.
+        Parameters:
+           entity (Entities.Entity) : The entity to kill
+        '''
+        entity.kill()
+        self.report(EventType.ENTITY_KILLED, entity = entity)
+        self.entities.remove(entity)
+
+        if entity in self.moving_boxes_positions:
+            self.moving_boxes.remove(entity)
+            self.unindex_moving_box(entity)
+
+    def index_moving_box(self, box):
+        '''
+        Add a moving box to the occupancy index at its current position.
+        '''
+        self.moving_boxes_positions[box] = box.position
+        self.moving_boxes_occupancy[box.position] += 1
+
+    def unindex_moving_box(self, box):
+        '''
+        Remove a moving box from the occupancy index.
+        '''
+        position = self.moving_boxes_positions.pop(box)
+        self.moving_boxes_occupancy[position] -= 1
+        if not self.moving_boxes_occupancy[position]:
+            del self.moving_boxes_occupancy[position]
+
+    def move_entity(self, entity, position):
+        '''
+        Change the position of an entity, keeping the moving boxes occupancy index up to date.
+        Parameters:
+            entity (Entities.Entity) : The entity to move
+            position ( tuple(x, y) ) : Its new position
+        '''
+        entity.position = position
+        if entity in self.moving_boxes_positions and self.moving_boxes_positions[entity] != position:
+            self.unindex_moving_box(entity)
+            self.index_moving_box(entity)
+
+    def is_blocked_by_moving_box(self, x, y):
+        '''
+        Returns:
+            bool : True if a moving box stands at (x, y)
+        '''
+        return (x, y) in self.moving_boxes_occupancy
+
+    def step(self):
+        '''
+        One tick of the game behaviour: entities' movement and behaviours, and detection of the end of the level.
+        Returns:
+            [Event, ...] : Every events reported since the last call to pop_events
+        '''
+        self.ticks += 1
+
+        width, height = self.mapsize
+        traversable = self.masks['traversable']
+        ladders = self.masks['ladder']
+        springs = self.masks['spring']
+        spikes = self.masks['spike']
+        portals = self.masks['portal']
+        buttons = self.masks['button']
+
+        # Entities
+        for entity in self.entities:
+            x = entity.position[0]
+            y = entity.position[1]
+
+
+            if entity.direction == Entities.Direction.RIGHT:
+                around_function = math.ceil
+            elif entity.direction == Entities.Direction.LEFT:
+                around_function = math.floor
+            else:
+                around_function = int
+
+            next_position_x = around_function(x + (entity.velocity * entity.direction))
+            next_position_y = int(y+0.1)
+
+            if next_position_x >= width or next_position_x < 0 or next_position_y >= height or next_position_y < 0: # If entity is out of the map: kill it
+                self.kill_entity(entity)
+                continue
+
+            current_coords = (int(x+0.5), int(y))
+            current_block = self.tiles.item(current_coords) # Identifier of the tile under the entity
+
+            if traversable.item(next_position_x, next_position_y) and not self.is_blocked_by_moving_box(next_position_x, next_position_y):
+                entity.velocity = entity.speed
+                self.move_entity(entity, (x + (entity.velocity * entity.direction), int(y))) # Int because we always want entity to be at a determined level
+            else:
+                entity.velocity = 0
+
+            if current_block == SPRING_LEFT and entity.direction == Entities.Direction.RIGHT and entity.position_in_block >= 0.5: # If entity is on a right-facing spring
+                entity.direction = Entities.Direction.LEFT
+                self.set_tile((next_position_x, int(y)), Tiles.SpringLeftPressed)
+
+            if current_block == SPRING_RIGHT and entity.direction == Entities.Direction.LEFT and entity.position_in_block <= 0.5: # If entity is on a left-facing spring
+                entity.direction = Entities.Direction.RIGHT
+                self.set_tile((next_position_x, int(y)), Tiles.SpringRightPressed)
+
+            if current_block == SPRING_RIGHT_PRESSED and entity.direction == Entities.Direction.RIGHT: # If entity leaves a left-facing spring
+                self.set_tile(current_coords, Tiles.SpringRight)
+                self.report(EventType.SPRING_RELEASED, entity = entity, coords = current_coords)
+
+            if current_block == SPRING_LEFT_PRESSED and entity.direction == Entities.Direction.LEFT: # If entity leaves a left-facing spring
+                self.set_tile(current_coords, Tiles.SpringLeft)
+                self.report(EventType.SPRING_RELEASED, entity = entity, coords = current_coords)
+
+            is_on_portal = portals.item(current_coords)
+
+            if is_on_portal and entity.travelable_in_portals and not entity.just_travelled_in_portal: # Enter a portal
+                entity.just_travelled_in_portal = True # To avoid being reteleported immediatly when go out of the portal
+
+                portal = self.portal_partners.get(current_coords) # Portal paired with this one
+                if portal:
+                    self.move_entity(entity, portal)
+                    if entity.start_y: # If entity is falling (because of gravity) while it is teleported: change it's start_y value to take account of delta between Y of the two portals
+                        entity.start_y += (portal[1] - current_coords[1])
+
+                    self.report(EventType.TELEPORTED, entity = entity, tile = Tiles.identifiers[current_block], origin = current_coords, destination = portal)
+
+            if not is_on_portal: # Exits the portal
+                entity.just_travelled_in_portal = False
+
+            if current_block == ANTIMATTER and entity == self.zardow_entity: # Collect antimatter (only for Zardow)
+                self.collected_antimatter += 1
+                current_block = AIR
+                self.set_tile(current_coords, Tiles.Air)
+                self.report(EventType.ANTIMATTER_COLLECTED, coords = current_coords, enough = self.collected_antimatter == self.needed_antimatter)
+
+            if spikes.item(current_coords): # If entity is on spikes: die
+                self.kill_entity(entity)
+                continue
+
+            if current_block == LADDER: # If entity is on ladders
+                self.move_entity(entity, (entity.position[0], entity.position[1] + 1))
+
+            is_on_button = buttons.item(current_coords)
+
+            if is_on_button and not entity.just_pressed_button: # If entity is on antigravity button
+                self.anti_gravity = not self.anti_gravity
+                entity.just_pressed_button = True
+                for e in self.entities:
+                    e.falling_time = 0
+                self.report(EventType.GRAVITY_REVERSED, entity = entity, anti_gravity = self.anti_gravity)
+
+            if not is_on_button: # If entity is not on antigravity button anymore
+                entity.just_pressed_button = False
+
+
+
+            # Gravity
+            if entity.subject_gravity: # Is entity is subject to gravity
+
+                y = entity.position[1]
+                if not self.anti_gravity: # Normal gravity
+                    y_to_test = math.ceil(y)-1
+                else: # Anti gravity
+                    y_to_test = math.floor(y)+1
+
+                if y_to_test < 0 or y_to_test >= height: # If entity vertically out of map: kill it
+                    self.kill_entity(entity)
+                    continue
+
+                x_to_test = math.floor(x+0.5)
+                is_on_spring = springs.item(current_coords)
+
+                if traversable.item(x_to_test, y_to_test) and not ladders.item(x_to_test, y_to_test) and not is_on_spring and not self.is_blocked_by_moving_box(x_to_test, y_to_test):
+                    if not entity.start_y:
+                        entity.start_y = y
+
+                    fall = 0.5 * 19 * ((entity.falling_time/self.update_frequency) ** 2) # y(t) = 1/2 gt^2 + y0 (here, g is 19)
+                    if not self.anti_gravity:
+                        yGravity = entity.start_y - fall
+                    else:
+                        yGravity = min(y_to_test+0.1, entity.start_y + fall)
+                    self.move_entity(entity, (entity.position[0], yGravity))
+                    entity.falling_time += 1
+                else:
+                    entity.falling_time = 0
+                    entity.start_y = 0
+
+
+            taking_off = entity is self.rocket_entity and entity.zardow_is_in # The rocket moves up while it holds Zardow
+
+            entity.update(instance=self) # Entity specific behaviour update
+            self.move_entity(entity, entity.position) # In case the entity moved itself
+
+            if taking_off and entity.zardow_is_in: # Still on the map (see Rocket.update)
+                self.report(EventType.ROCKET_TAKING_OFF, entity = entity, position = entity.position)
+
+
+        ### Zardow behaviour
+
+        if ((int(self.zardow_entity.position[0]) == int(self.rocket_entity.position[0])) and
+                (int(self.zardow_entity.position[1]) == int(self.rocket_entity.position[1])) and
+                (self.zardow_entity in self.entities)): # If Zardow on the rocket
+
+            if self.collected_antimatter == self.needed_antimatter: # Enough antimatter and : win
+                self.rocket_entity.zardow_is_in = True
+                self.entities.remove(self.zardow_entity)
+                self.won = True
+                self.report(EventType.LEVEL_WON)
+            else:
+                self.kill_entity(self.zardow_entity)
+
+        if (self.zardow_entity.dead or self.rocket_entity.dead) and not self.lost: # If any Zardow or the rocket (normally not happening) die
+            self.lost = True
+            self.report(EventType.LEVEL_LOST)
+
+        return self.pop_events()
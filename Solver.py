@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##################################################
+################################################## SOLVER.PY
+##################################################
+
+'''
+Brute-force level solver.
+Try every way to place the inventory of a level on its target tiles (and optionally every moment to break the boxes with SPACE),
+simulate each of them headlessly, and report the ones that make Zardow reach his rocket.
+
+Usage:
+    python3 Solver.py tuto3 earth1      Solve these levels
+    python3 Solver.py --pack            Solve every level of LevelPack.json
+
+Note: tiles are always placed before the first tick, the solver doesn't try to place them while Zardow is moving.
+'''
+
+import argparse
+import collections
+import contextlib
+import multiprocessing
+
+with contextlib.redirect_stdout(None): # Import pygame (through Tiles and Entities) without showing the "Hello from the pygame community" message
+    import Simulation
+    import Tiles
+    from utilities import import_level_as_module
+
+import LevelCatalog
+
+
+loaded_levels = {} # Levels already imported by this process
+
+
+def get_level(name):
+    '''
+    Import a level only once per process.
+    Parameters:
+        name (str) : The level name
+    Returns:
+        (module) : The level as a loaded module
+    '''
+    if name not in loaded_levels:
+        loaded_levels[name] = import_level_as_module(name)
+    return loaded_levels[name]
+
+def get_targets(level):
+    '''
+    Returns:
+        [ (x, y), ...] : The coordinates of every target tiles of the level
+    '''
+    return [(x, y) for x,row in enumerate(level.dimension) for y,tileId in enumerate(row) if tileId == Simulation.TARGET]
+
+def has_boxes(level):
+    '''
+    Returns:
+        bool : True if the level contains boxes that can be broken with SPACE
+    '''
+    box_id = Tiles.ids[Tiles.Box]
+    return any(box_id in row for row in level.dimension)
+
+def get_placements(targets, inventory):
+    '''
+    Enumerate every way to place (some of) the inventory tiles on the target tiles.
+    Identical tiles are not permuted, so every placement is yielded only once.
+    Parameters:
+        targets ( [ (x, y), ...] ) : The coordinates of the target tiles
+        inventory ( [subclass of Tiles.Tile, ...] ) : The tiles of the toolbox
+    Returns:
+        [ ( ((x, y), tileType), ...), ...] : The placements
+    '''
+    remaining = collections.Counter(inventory)
+    tile_types = list(remaining) # Keep the inventory order
+
+    def place(index):
+        if index == len(targets):
+            yield ()
+            return
+
+        for placement in place(index + 1): # Leave this target empty
+            yield placement
+
+        for tileType in tile_types:
+            if remaining[tileType]:
+                remaining[tileType] -= 1
+                for placement in place(index + 1):
+                    yield ((targets[index], tileType),) + placement
+                remaining[tileType] += 1
+
+    return place(0)
+
+def simulate(candidate):
+    '''
+    Play a level with a placement until it is won or lost, or until it comes back to an already seen state (it will never be won then).
+    Executed in the workers of the process pool.
+    Parameters:
+        candidate ( tuple(level_name, placement, space_tick, max_ticks) ) : space_tick is the tick at which SPACE is pressed (None to never press it)
+    Returns:
+        tuple(level_name, placement, space_tick, ticks) : ticks is the number of ticks needed to win, or None if the level is not won
+    '''
+    level_name, placement, space_tick, max_ticks = candidate
+    simulation = Simulation.Simulation(get_level(level_name))
+
+    for coords, tileType in placement:
+        if not simulation.place_tile(coords, tileType): # Target under Zardow
+            return (level_name, placement, space_tick, None)
+
+    seen_states = set()
+
+    while simulation.ticks < max_ticks and not (simulation.won or simulation.lost):
+        if simulation.ticks == space_tick:
+            simulation.break_boxes()
+        elif space_tick is None or simulation.ticks > space_tick: # Nothing will happen from outside anymore: stop if the level loops
+            state = simulation.get_state()
+            if state in seen_states:
+                break
+            seen_states.add(state)
+        simulation.step()
+
+    return (level_name, placement, space_tick, simulation.ticks if simulation.won else None)
+
+def get_candidates(level_name, max_ticks = 1000, space_step = 10, space_until = 200):
+    '''
+    Enumerate every candidate to simulate for a level.
+    Parameters:
+        level_name (str) : The level name
+        max_ticks (int) : Number of ticks after which a candidate is considered as lost
+        space_step (int) : Delay between two tried SPACE timings (only for levels containing boxes)
+        space_until (int) : Last tried SPACE timing
+    Returns:
+        [ tuple(level_name, placement, space_tick, max_ticks), ...] : The candidates, see simulate
+    '''
+    level = get_level(level_name)
+
+    space_ticks = [None]
+    if has_boxes(level):
+        space_ticks.extend(range(0, space_until + 1, space_step))
+
+    for placement in get_placements(get_targets(level), level.inventory):
+        for space_tick in space_ticks:
+            yield (level_name, placement, space_tick, max_ticks)
+
+def solve(level_names, max_ticks = 1000, space_step = 10, space_until = 200, processes = None):
+    '''
+    Solve levels using every cores of the computer.
+    Parameters:
+        level_names ( [str, ...] ) : The names of the levels to solve
+        processes (int) : Number of worker processes, default: number of cores
+        See get_candidates for the other parameters
+    Returns:
+        { level_name: [ tuple(placement, space_tick, ticks), ...] } : Winning candidates of each level, fastest first
+    '''
+    solutions = {level_name: [] for level_name in level_names}
+
+    candidates = (candidate for level_name in level_names for candidate in get_candidates(level_name, max_ticks, space_step, space_until))
+
+    with multiprocessing.Pool(processes) as pool:
+        for level_name, placement, space_tick, ticks in pool.imap_unordered(simulate, candidates, chunksize = 64):
+            if ticks is not None:
+                solutions[level_name].append((placement, space_tick, ticks))
+
+    for level_solutions in solutions.values():
+        level_solutions.sort(key = lambda solution: solution[2])
+
+    return solutions
+
+def describe_placement(placement):
+    '''
+    Returns:
+        str : A human readable placement, like "PortalBlue (3, 4), SpringLeft (5, 1)"
+    '''
+    if not placement:
+        return 'nothing placed'
+    return ', '.join('{tile} {coords}'.format(tile = tileType.__name__, coords = coords) for coords, tileType in placement)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Find every solutions of Zardow levels.')
+    parser.add_argument('levels', nargs = '*', help = 'names of the levels to solve (files of the Levels directory, without extension)')
+    parser.add_argument('--pack', action = 'store_true', help = 'solve every level of LevelPack.json')
+    parser.add_argument('--max-ticks', type = int, default = 1000, help = 'ticks after which a try is considered as lost (default: 1000)')
+    parser.add_argument('--space-step', type = int, default = 10, help = 'delay in ticks between two tried SPACE timings (default: 10)')
+    parser.add_argument('--space-until', type = int, default = 200, help = 'last tried SPACE timing (default: 200)')
+    parser.add_argument('--processes', type = int, default = None, help = 'number of worker processes (default: number of cores)')
+    parser.add_argument('--all', action = 'store_true', help = 'show every solution, not only the fastest one')
+    arguments = parser.parse_args()
+
+    level_names = list(arguments.levels)
+    if arguments.pack:
+        level_names.extend(level['path'] for level in LevelCatalog.LevelCatalog('LevelPack.json').get_levels() if 'animation' not in level)
+
+    if not level_names:
+        parser.error('no level to solve')
+
+    solutions = solve(level_names, arguments.max_ticks, arguments.space_step, arguments.space_until, arguments.processes)
+
+    for level_name in level_names:
+        level_solutions = solutions[level_name]
+        print ('{level}: {count} solution(s)'.format(level = level_name, count = len(level_solutions)))
+
+        for placement, space_tick, ticks in (level_solutions if arguments.all else level_solutions[:1]):
+            space = ', SPACE at tick {tick}'.format(tick = space_tick) if space_tick is not None else ''
+            print ('    won in {ticks} ticks: {placement}{space}'.format(ticks = ticks, placement = describe_placement(placement), space = space))
@@ -5,10 +5,12 @@
 ################################################## TILES.PY
 ##################################################
 
-import pygame, os
+import pygame, os, collections
 from utilities import *
 
 class Tile(pygame.sprite.Sprite):
+    traversable = False # Can entities walk through this tile
+
     def __init__(self,img,*args,**kwargs):
         '''
         A Tile is an item of the Tilemap.
@@ -44,7 +46,6 @@ class Tile(pygame.sprite.Sprite):
 
         self.describing_image = None # Image as they will be shown in toolbox / level editor
 
-        self.traversable = False
         self.portalId = None
 
     def __repr__(self):
@@ -52,7 +53,7 @@ class Tile(pygame.sprite.Sprite):
         Moslty used for debug:
             print (ladders_tile_instance) -> <Tile 25>
         '''
-        return '<Tile %i>'%(list(identifiers.keys())[list(identifiers.values()).index(type(self))])
+        return '<Tile %i>'%ids[type(self)]
 
     def is_type(self, blocType):
         '''
@@ -115,9 +116,10 @@ class Air(Tile):
     Air tile if the default one.
     It is traversable by entities
     '''
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self,None,*args,**kwargs)
-        self.traversable = True
 
 class GrassTile(Tile):
     def __init__(self,*args,**kwargs):
@@ -156,25 +158,29 @@ class GrassHalfRight(Tile):
         Tile.__init__(self, 'Ressources/Tiles/grassHalfRight.png',*args,**kwargs)
 
 class Antimatter(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/antimatter.png',*args,**kwargs)
-        self.traversable = True
 
 
 class PortalBlue(Tile):
+    traversable = True
+
     def __init__(self,target=None,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/portalBlue.gif',*args,**kwargs)
-        self.traversable = True
 
 class PortalGreen(Tile):
+    traversable = True
+
     def __init__(self,target=None,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/portalGreen.gif',*args,**kwargs)
-        self.traversable = True
 
 class PortalRed(Tile):
+    traversable = True
+
     def __init__(self,target=None,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/portalRed.gif',*args,**kwargs)
-        self.traversable = True
         
 
 class DirtTile(Tile):
@@ -182,80 +188,85 @@ class DirtTile(Tile):
         Tile.__init__(self, 'Ressources/Tiles/dirt.png',*args,**kwargs)
 
 class SpringLeft(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/springLeft.png',*args,**kwargs)
-        self.traversable = True
 
 class SpringRight(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/springRight.png',*args,**kwargs)
-        self.traversable = True
 
 class SpringLeftPressed(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/springLeftPressed.png',*args,**kwargs)
-        self.traversable = True
 
 class SpringRightPressed(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/springRightPressed.png',*args,**kwargs)
-        self.traversable = True
         
 class TileTarget(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/target.png',*args,**kwargs)
-        self.traversable = True
 
 class Box(Tile):
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/box.png',*args,**kwargs)
-        self.traversable = False
 
 class BrokenBox(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/brokenBox.png',*args,**kwargs)
-        self.traversable = True
         
 class InvisibleBloc(Tile):
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, None,*args,**kwargs)
-        self.traversable = False
         self.describing_image = 'Ressources/Tiles/invisible.png'
         
 class Bricks(Tile):
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/bricks.png',*args,**kwargs)
-        self.traversable = False
         
 class Spikes(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/spikes.png',*args,**kwargs)
-        self.traversable = True
         
 class Ladder(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/ladder.png',*args,**kwargs)
-        self.traversable = True
     
 class ButtonUp(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/buttonUp.png',*args,**kwargs)
-        self.traversable = True
         
 class ButtonDown(Tile):
+    traversable = True
+
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/buttonDown.png',*args,**kwargs)
-        self.traversable = True
         
 class Metal(Tile):
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/metal.png',*args,**kwargs)
-        self.traversable = False
 
 class SpikesDown(Tile):
     def __init__(self,*args,**kwargs):
         Tile.__init__(self, 'Ressources/Tiles/spikesDown.png',*args,**kwargs)
-        self.traversable = False
 
 
 
@@ -294,6 +305,31 @@ identifiers = {
     29: SpikesDown,
 }
 
+ids = {tileType: identifier for identifier, tileType in identifiers.items()} # Reverse of identifiers
+
+
+# Flyweight tiles: the tilemap only stores tile types, everything needed to draw or to describe a tile is shared by all tiles of a type
+
+TileDescriptor = collections.namedtuple('TileDescriptor', ['identifier', 'type', 'image', 'describing_image', 'traversable'])
+
+descriptors = {} # {(tile type, size): TileDescriptor}
+
+def get_descriptor(tileType, size):
+    '''
+    Returns the descriptor shared by every tile of a type, at a size.
+    Only one Tile instance is ever created for each type and size, to build the descriptor.
+    Parameters:
+        tileType (subclass of Tile) : The tile type
+        size ( tuple(x, y) ) : The size of the images
+    Returns:
+        TileDescriptor : The (immutable) descriptor
+    '''
+    key = (tileType, size)
+    if key not in descriptors:
+        tile = tileType(size = size)
+        descriptors[key] = TileDescriptor(ids[tileType], tileType, tile.image, tile.get_describing_image(size), tileType.traversable)
+    return descriptors[key]
+
 
 if __name__ == '__main__':
     print ('\nSyntax: OK')
\ No newline at end of file
@@ -7,78 +7,203 @@
 
 import pygame
 
+import Tiles
+
 class Toolbox(pygame.Surface):
-    tile_side_size = None
     '''
     Represents the toolbox of the game.
-    It can contains up to 10 items.
+    It shows 10 slots. When there are more items, they are split in pages, and the first and last slots become arrows to browse them.
+    The toolbox is rendered only when its items, the selection or the page change, otherwise drawing it is a single blit.
     '''
-    
+    tile_side_size = None
+    slots = 10 # Number of slots shown at once
+
     def __init__(self, items=[], selected=0):
-        
-        width = (10 * Toolbox.tile_side_size) + (11 * 8)
+
+        width = (Toolbox.slots * Toolbox.tile_side_size) + ((Toolbox.slots + 1) * 8)
         height = Toolbox.tile_side_size + (2 * 16)
         self.rect = pygame.Rect(10, 10, width, height)
-        
+
         pygame.Surface.__init__(self, size=(self.rect[2], self.rect[3]))
-        
+
+        self.needs_render = True # False while self shows the current items, selection and page
+
         self.items = items
+        self.page = 0
         if self.items:
             self.selected_slot = selected
             self.selected_item = self.items[self.selected_slot]
         else:
             self.selected_slot = None
             self.selected_item = None
-        
+
+    @property
+    def items(self):
+        return self._items
+
+    @items.setter
+    def items(self, items):
+        self._items = items
+        self.needs_render = True
+
+    @property
+    def selected_slot(self):
+        return self._selected_slot
+
+    @selected_slot.setter
+    def selected_slot(self, selected_slot):
+        self._selected_slot = selected_slot
+        self.needs_render = True
+
+    def is_paged(self):
+        '''
+        Returns:
+            bool : True if the items don't fit in the toolbox, and are split in pages
+        '''
+        return len(self.items) > Toolbox.slots
+
+    def get_page_size(self):
+        '''
+        Returns:
+            int : Number of items shown at once (the arrows take two slots when the toolbox is paged)
+        '''
+        return Toolbox.slots - 2 if self.is_paged() else Toolbox.slots
+
+    def get_pages_count(self):
+        '''
+        Returns:
+            int : Number of pages (at least 1)
+        '''
+        page_size = self.get_page_size()
+        return max(1, (len(self.items) + page_size - 1) // page_size)
+
+    def get_shown_slot(self, slot):
+        '''
+        Parameters:
+            slot (int) : The index of an item
+        Returns:
+            int : The position of the item in the toolbox, None if it is not on the current page
+        '''
+        if slot is None:
+            return None
+
+        page_size = self.get_page_size()
+        if slot // page_size != self.page:
+            return None
+        return slot % page_size + (1 if self.is_paged() else 0)
+
+    def show_slot(self, slot):
+        '''
+        Show the page containing an item.
+        Parameters:
+            slot (int) : The index of the item
+        '''
+        if slot is not None and slot >= 0:
+            self.page = slot // self.get_page_size()
+        self.page = max(0, min(self.page, self.get_pages_count() - 1))
+        self.needs_render = True
+
     def selectByClick(self, pos):
         '''
-        Set the selected slot and the selected item according to the mouse position when a click was detected by the main game
+        Set the selected slot and the selected item according to the mouse position when a click was detected by the main game.
+        If the toolbox is paged and the click is on an arrow, show the previous or the next page instead.
         Parameters:
             pos ( tuple(x, y) ) : The position of the mouse click
         '''
         x = pos[0]
-        
+
         slot = int((x - 8) / (Toolbox.tile_side_size + 8))
-        self.selected_slot = min(9,slot)
-        
+        slot = min(Toolbox.slots - 1, slot)
+
+        if self.is_paged():
+            if slot <= 0:
+                self.page = max(0, self.page - 1)
+                self.needs_render = True
+                return
+            if slot == Toolbox.slots - 1:
+                self.page = min(self.get_pages_count() - 1, self.page + 1)
+                self.needs_render = True
+                return
+            slot = self.page * self.get_page_size() + slot - 1
+
+        self.selected_slot = slot
+
         if self.selected_slot > len(self.items)-1:
             self.selected_slot = len(self.items)-1
-        
+
         self.selected_item = self.items[self.selected_slot]
-        
-    def draw(self, surface):
+
+    def render(self):
         '''
-        Draw the toolbox and its items on the specified surface
+        Render the toolbox and its items on itself.
         '''
         self.fill((204,255,255))
-        
-        if self.items and (self.selected_slot != None):
-            pygame.draw.rect(self, (220,220,220), (8 + (Toolbox.tile_side_size + 8) * self.selected_slot - 4, 8, Toolbox.tile_side_size + (4 * 2), Toolbox.tile_side_size + 16))
-        
-        
-        for index,item in enumerate(self.items): 
-            instance = item(size = (Toolbox.tile_side_size, Toolbox.tile_side_size))
-        
-            x = 8 + (Toolbox.tile_side_size + 8) * index
-            y = (self.get_height()/2) - (instance.height /2)
-        
-            self.blit(instance.get_describing_image((Toolbox.tile_side_size, Toolbox.tile_side_size)), (x, y, instance.width, instance.height))
-        
-        surface.blit(self, (self.rect[0],self.rect[1]))
-        
+
+        shown_selected_slot = self.get_shown_slot(self.selected_slot) if self.items else None
+        if shown_selected_slot is not None:
+            pygame.draw.rect(self, (220,220,220), (8 + (Toolbox.tile_side_size + 8) * shown_selected_slot - 4, 8, Toolbox.tile_side_size + (4 * 2), Toolbox.tile_side_size + 16))
+
+        page_size = self.get_page_size()
+        first = self.page * page_size
+        offset = 1 if self.is_paged() else 0
+
+        for index,item in enumerate(self.items[first:first + page_size]):
+            descriptor = Tiles.get_descriptor(item, (Toolbox.tile_side_size, Toolbox.tile_side_size))
+
+            x = 8 + (Toolbox.tile_side_size + 8) * (index + offset)
+            y = (self.get_height()/2) - (descriptor.image.get_height() /2)
+
+            self.blit(descriptor.describing_image, (x, y))
+
+        if self.is_paged():
+            self.draw_arrow(0, -1, self.page > 0)
+            self.draw_arrow(Toolbox.slots - 1, 1, self.page < self.get_pages_count() - 1)
+
+    def draw_arrow(self, shown_slot, direction, enabled):
+        '''
+        Draw a page arrow in a slot.
+        Parameters:
+            shown_slot (int) : The position of the slot in the toolbox
+            direction (int) : -1 for an arrow pointing left, 1 for an arrow pointing right
+            enabled (bool) : False if there is no page in this direction (the arrow is greyed)
+        '''
+        side = Toolbox.tile_side_size
+        left = 8 + (side + 8) * shown_slot
+        center_y = self.get_height() / 2
+
+        tip_x = left + (side * 3/4 if direction > 0 else side / 4)
+        base_x = left + (side / 4 if direction > 0 else side * 3/4)
+        points = [(tip_x, center_y), (base_x, center_y - side / 3), (base_x, center_y + side / 3)]
+
+        pygame.draw.polygon(self, (90,90,90) if enabled else (180,200,200), points)
+
+    def draw(self, surface):
+        '''
+        Draw the toolbox and its items on the specified surface, rendering it again only if it changed
+        Returns:
+            pygame.Rect : The area of the surface covered by the toolbox
+        '''
+        if self.needs_render:
+            self.render()
+            self.needs_render = False
+
+        return surface.blit(self, (self.rect[0],self.rect[1]))
+
     def sort(self):
         '''
-        Avoid having empty slots between items in the toolbox. It aligns every items on the left. 
+        Avoid having empty slots between items in the toolbox. It aligns every items on the left.
         '''
-        while None in self.items:
-            self.items.remove(None)
-        
+        self.items[:] = [item for item in self.items if item is not None]
+        self.needs_render = True # The items may have been changed in place (see Zardow.mainloop)
+
         #self.selected_slot = 0
-        
+
         if self.selected_slot > len(self.items)-1:
             self.selected_slot = len(self.items)-1
-            
+
         if self.selected_slot<0:
             self.selected_item = None
         else:
-            self.selected_item = self.items[self.selected_slot]
\ No newline at end of file
+            self.selected_item = self.items[self.selected_slot]
+
+        self.show_slot(self.selected_slot)
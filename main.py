@@ -10,9 +10,15 @@ except ImportError:
 	print ('Can\'t find module Pygame. Install it with "pip3 install pygame" (sudo permissions required)')
 	exit()
 
+try:
+	import numpy
+except ImportError:
+	print ('Can\'t find module Numpy. Install it with "pip3 install numpy" (sudo permissions required)')
+	exit()
+
 import math
 import os
-import json
+import collections
 
 import Tiles
 import Toolbox
@@ -20,26 +26,10 @@ import LevelChooser as lc
 import Entities
 from utilities import *
 import Effects
-import importlib.util
-
-
-def import_level_as_module(name):
-	'''
-	Import the level (as a module) for the given name
-	Parameters:
-	   name (str) : The level name to load
-	Returns:
-	   (module) : The level as a loaded module
-
-	Note: The imp module used in this function seems to be deprecated.
-	'''
-
-	levelPath = 'Levels/'+name
-
-	spec = importlib.util.spec_from_file_location("Level", levelPath + ".py")
-	module = importlib.util.module_from_spec(spec)
-	spec.loader.exec_module(module)
-	return module
+import Simulation
+import Prefetcher
+import LevelCatalog
+import Overlays
 
 class Music: # Needed to convert to OGG because of a crash when filetype was WAV (maybe file was too large to be loaded?)
 	Theme = 'Zardow Theme.ogg'
@@ -48,6 +38,8 @@ class Music: # Needed to convert to OGG because of a crash when filetype was WAV
 	environment = {'earth':Theme,'space':Space}
 	all = [Theme, Space]
 
+LevelSnapshot = collections.namedtuple('LevelSnapshot', ['name', 'level', 'simulation', 'level_image']) # A level as it is just after being loaded, to restart it instantly
+
 class Zardow(object):
 	'''
 	Main class of the game
@@ -96,69 +88,67 @@ class Zardow(object):
 	def load_level(self,levelName):
 		'''
 		Load the level named as the parameter levelName, build new dimension, set Zardow's position,...
-		Use self.load_level(self.level_name) to restart the current level.
+		Use self.load_level(self.level_path) to restart the current level (instantly: restarts use a snapshot taken when the level was loaded).
 		Parameters:
 		   levelName (str) : The name of the level to play
 		'''
 
 		self.level_path = levelName
-		level = import_level_as_module('%s'%levelName)
 
-		self.mapsize = (20,20) # Always 20*20
+		restarting = self.level_snapshot is not None and self.level_snapshot.name == levelName # Restart from the snapshot instead of loading the level again
+		prepared_level = None if restarting else self.prefetcher.take(levelName) # Maybe prepared in background (see prefetch_next_level)
+
+		if restarting:
+			level = self.level_snapshot.level
+			self.simulation = self.level_snapshot.simulation.copy()
+		elif prepared_level:
+			level = prepared_level.level
+			self.simulation = prepared_level.simulation
+			for (path, size), image in prepared_level.sprites.items(): # Entities will find their images already decoded
+				import_decoded_image(path, size, image)
+		else:
+			level = import_level_as_module('%s'%levelName)
+			self.simulation = Simulation.Simulation(level, self.update_frequency)
+
+		self.mapsize = self.simulation.mapsize
 		self.background_image = level.background
 		self.play_music(Music.environment[level.music])
-		dimensionNum = level.dimension
-
-		self.toolbox = Toolbox.Toolbox(level.inventory, 0 )
 
-		self.dimension = []
-		#list(map(lambda a: list(map(getTileInstance,a)),dimensionNum))
-		for x,row in enumerate(dimensionNum):
-			subDim = []
-			for y,tileId in enumerate(row):
-				tile = Tiles.identifiers[tileId](size = (self.tile_side_size,self.tile_side_size), coords=(x, y))
-				subDim.append(tile)
-
-			self.dimension.append(subDim)
+		self.toolbox = Toolbox.Toolbox(list(level.inventory), 0 ) # Copy: the toolbox removes the placed items, the level is kept for restarts
 
 		self.level_surface = pygame.Surface((self.window_size, self.window_size))
 
 		self.level_message = level.message
-		self.needed_antimatter = level.antimatter
-		level_image = load_image('Ressources/Backgrounds/'+level.background)
-		width = int(self.window_size * (level_image.get_width()/800))
-		self.level_image = pygame.transform.scale(level_image, (width, self.window_size))
+		if restarting:
+			self.level_image = self.level_snapshot.level_image
+		elif prepared_level:
+			self.level_image = convert_image(prepared_level.background)
+		else:
+			level_image = load_image('Ressources/Backgrounds/'+level.background)
+			width = int(self.window_size * (level_image.get_width()/800))
+			self.level_image = pygame.transform.scale(level_image, (width, self.window_size))
+
+		if not restarting:
+			self.level_snapshot = LevelSnapshot(levelName, level, self.simulation.copy(), self.level_image)
 
+		# Rendered once per level, drawn above the tiles
+		self.level_message_images = []
+		for line, message in enumerate(self.level_message[:2]):
+			message_image = render_text(message, 48)
+			message_rect = message_image.get_rect(center = (self.level_surface.get_width() / 2, self.level_surface.get_height() / 4 + 48 * line))
+			self.level_message_images.append((message_image, message_rect))
 
-		self.collected_antimatter = 0
+		self.antimatter_counter_images = self.render_antimatter_counter()
 
 		# Sprite managment
-		self.effects = []
+		self.effects.clear() # Stops the animation being played, if the player leaves it (retry, menu)
 		self.need_build_map = True
-
-
-		# Entities managment
-		self.zardow_entity = Entities.Zardow()
-		self.zardow_entity.position = level.position
-		self.zardow_entity.direction = level.direction
-
-		self.rocket_entity = Entities.Rocket()
-		self.rocket_entity.position = level.rocketPosition
-
-		self.entities = [self.zardow_entity, self.rocket_entity] # Create entities array containing every entities instances actually in the game, default containing just the main character and the rocket
-
-		if hasattr(level, 'entities'):
-			self.entities.extend(level.entities)
-			self.moving_boxes = list(filter(lambda e: isinstance(e, Entities.MovingBox), self.entities))
-
-		else:
-			self.moving_boxes = []
+		self.dirty_areas = [] # Parts of self.level_surface to redraw at next refresh_display (when only a few tiles changed)
+		self.drawn_rects = [] # Parts of the window drawn above the level surface at the last refresh_display
 
 		self.level_won = False
 		self.pause = False
 
-		self.anti_gravity = False
-
 	def load_sounds(self, sounds):
 		'''
 		Preload sounds and effects for the game to play them quicker when needed.
@@ -236,8 +226,27 @@ class Zardow(object):
 			print ('No audio output detected')
 
 		self.surface = pygame.display.set_mode((self.window_size, self.window_size))
+		convert_loaded_images() # Images are converted to the pixel format of the display
 		pygame.display.set_caption(self.window_title)
 
+		# Core sprites are used all along the game: never forget them
+		for path in ('Ressources/Hud', 'Ressources/Entity', 'Ressources/Tiles'):
+			importedImages.pin(path)
+
+		# Small sprites are packed in a few sheets
+		for path in ('Ressources/Hud', 'Ressources/Entity', 'Ressources/Tiles', 'Ressources/Particles'):
+			spritesAtlas.include(path)
+
+		# Animation frames are big and shown once: decoding them is better than filling the disk cache with them
+		decodedImages.exclude('Ressources/Animations')
+
+		# Particles textures are scanned and loaded once for all
+		Effects.textureSets.preload(os.path.join('Ressources/Particles', directory) for directory in sorted(os.listdir('Ressources/Particles')) if not directory.startswith('.'))
+
+		# Tiles are packed at the tile size all at once, instead of one by one while the first map is drawn
+		for tileType in Tiles.identifiers.values():
+			Tiles.get_descriptor(tileType, (self.tile_side_size, self.tile_side_size))
+
 		#self.surface.fill(self.bgcolor)
 
 		pygame.key.set_repeat(self.key_repeat_time, self.key_repeat_time)
@@ -250,331 +259,280 @@ class Zardow(object):
 
 		self.level_chooser = lc.LevelChooser(self.window_size, [])
 
+		self.prefetcher = Prefetcher.LevelPrefetcher(self.window_size, self.update_frequency)
+		self.effects = Effects.EffectManager() # Effects of the current level, cleared by load_level
+		self.level_snapshot = None # The current level as it was just after being loaded (see load_level)
+		self.level_catalog = LevelCatalog.LevelCatalog('LevelPack.json')
+
+		self.build_overlays()
+		self.overlays_state = None # Overlays drawn at the last refresh_display, and their state (see Overlays.Overlay.get_state)
+
 		self.just_clicked = False
 
 		#self.refresh_display()
 
+	def build_overlays(self):
+		'''
+		Build the screens drawn above the level (menu, "You Win", pause, in-game buttons) once for the window size, see refresh_display.
+		'''
+		button_width = 256
+		button_height = 64
+		half_size = self.window_size / 2
+
+		self.play_button_rect = pygame.Rect(half_size - (button_width / 2), 3/8*self.window_size, button_width, button_height)
+		self.next_button_rect = pygame.Rect(half_size - (button_width / 2), half_size, button_width, button_height)
+		self.resume_button_rect = pygame.Rect(half_size - (button_width / 2), half_size, button_width, button_height)
+
+		self.retry_button_rect = pygame.Rect(self.window_size - 32 - 32, 32, 32, 38)
+		self.pause_button_rect = pygame.Rect(self.window_size - 2 * (32 + 32), 32, 32, 38)
+		self.menu_button_rect = pygame.Rect(self.window_size - 3 * (32 + 32), 32, 32, 38)
+
+		# Menu: title and Play button
+		title_image = load_image('Ressources/Hud/menuTitleWithoutZardow.png',(515,144))
+		width = 10 * self.tile_side_size
+		height = int(width * (322 / 2272))
+		title_image = pygame.transform.scale(title_image, (width, height))
+		self.menu_overlay = Overlays.Overlay(self.window_size, title = (title_image, (5 * self.tile_side_size, 2 * self.tile_side_size)),
+			buttons = [Overlays.Button(self.play_button_rect, 'Ressources/Hud/playButton.png', 'Ressources/Hud/playButtonHover.png')])
+
+		# "You Win" screen
+		won_title_image = load_image('Ressources/Hud/wonTitle.png',(629,150))
+		self.won_overlay = Overlays.Overlay(self.window_size, dim = True, title = (won_title_image, (half_size - (won_title_image.get_width() / 2)-12, self.window_size/4)),
+			buttons = [Overlays.Button(self.next_button_rect, 'Ressources/Hud/nextButton.png', 'Ressources/Hud/nextButtonHover.png')])
+
+		# Pause screen
+		pause_title_image = load_image('Ressources/Hud/pauseTitle.png',(629,150))
+		self.pause_overlay = Overlays.Overlay(self.window_size, dim = True, title = (pause_title_image, (half_size - (pause_title_image.get_width() / 2)-12, self.window_size/4)),
+			buttons = [Overlays.Button(self.resume_button_rect, 'Ressources/Hud/resumeButton.png', 'Ressources/Hud/resumeButtonHover.png')])
+
+		# In-game buttons
+		self.game_buttons_overlay = Overlays.Overlay(self.window_size, buttons = [
+			Overlays.Button(self.retry_button_rect, 'Ressources/Hud/retry.png'),
+			Overlays.Button(self.pause_button_rect, 'Ressources/Hud/pauseButton.png'),
+			Overlays.Button(self.menu_button_rect, 'Ressources/Hud/menuButton.png')
+		])
+
+	def get_overlays(self):
+		'''
+		Returns:
+			[Overlays.Overlay, ...] : The overlays to draw above the level in the current status of the game (in game, in menu, paused, win), in order
+		'''
+		overlays = []
+		if self.is_menu:
+			overlays.append(self.menu_overlay)
+		if self.level_won:
+			overlays.append(self.won_overlay)
+		if self.pause:
+			overlays.append(self.pause_overlay)
+		if (not self.is_menu) and (not self.level_won):
+			overlays.append(self.game_buttons_overlay)
+		return overlays
+
 	def reset_game(self):
 		self.is_menu = True
 
 
 	def update(self):
 		'''
-		The update fonction represents one refresh of the game behaviour.
+		The update fonction represents one refresh of the game.
 		It is called by the self.clock Pygame clock, at a frequency "self.update_frequency" defined in __init__.
-		Globally, this function is responsible of entities' movement and behaviours, of visual effects updates, of detecting if the current level is won or should be restarted, and call refresh_display()
+		The game behaviour itself is computed by self.simulation.step(), this function presents the reported events (sounds, visual effects), updates visual effects, restarts the level if needed and call refresh_display()
 		'''
 
-		# Entities
-		for entity in self.entities:
-			x = entity.position[0]
-			y = entity.position[1]
-
+		self.present_events(self.simulation.step())
 
-			if entity.direction == Entities.Direction.RIGHT:
-				around_function = math.ceil
-				around_opposite_function = math.floor
-			elif entity.direction == Entities.Direction.LEFT:
-				around_function = math.floor
-				around_opposite_function = math.ceil
-			else:
-				around_function = int
-				around_opposite_function = int
-
-			next_position_x = around_function(x + (entity.velocity * entity.direction))
-			next_position_y = int(y+0.1)
-
-			if next_position_x >= 20 or next_position_x < 0 or next_position_y >= 20 or next_position_y < 0: # If entity is out of the map: kill it
-				self.kill_entity(entity)
-				continue
+		### Presenting effects and particles
 
-			next_block = self.dimension[next_position_x][next_position_y]
-			current_block = self.dimension[int(x+0.5)][int(y)]
-			previous_block = self.dimension[int(x-0.5)][int(y)]
+		self.effects.present()
 
+		### End effects presenting
 
-			is_blocked_by_moving_box = False
-			for b in self.moving_boxes:
-				if b.position[0] == next_position_x and b.position[1] == next_position_y:
-					is_blocked_by_moving_box = True
+		if self.simulation.lost: # If any Zardow or the rocket (normally not happening) die
+			self.load_level(self.level_path)
 
-			if next_block.traversable and not is_blocked_by_moving_box:
-				entity.velocity = entity.speed
-				entity.position = (x + (entity.velocity * entity.direction), int(y)) # Int because we always want entity to be at a determined level
-			else:
-				entity.velocity = 0
+		self.refresh_display()
 
-			#print ('Pos', entity.position,'| Current', current_block,'| Prev',previous_block,'| Next', next_block,'| Intra',entity.position_in_block) # Debug
 
-			if current_block.is_type(Tiles.SpringLeft) and entity.direction == Entities.Direction.RIGHT and entity.position_in_block >= 0.5: # If entity is on a right-facing spring
-				entity.direction = Entities.Direction.LEFT
-				self.dimension[next_position_x][int(y)] = next_block.become(Tiles.SpringLeftPressed)
-				self.need_build_map = True
+	def present_events(self, events):
+		'''
+		Play sounds and show visual effects for the events reported by the simulation.
+		Parameters:
+		   events ( list of Simulation.Event ) : The events to present, in chronological order
+		'''
+		boxes_broken = False
 
-			if current_block.is_type(Tiles.SpringRight) and entity.direction == Entities.Direction.LEFT and entity.position_in_block <= 0.5: # If entity is on a left-facing spring
-				entity.direction = Entities.Direction.RIGHT
-				self.dimension[next_position_x][int(y)] = next_block.become(Tiles.SpringRightPressed)
-				self.need_build_map = True
+		for event in events:
+			if event.type == Simulation.EventType.TILE_CHANGED:
+				x, y = event.coords
+				self.dirty_areas.append(pygame.Rect(x * self.tile_side_size, (self.mapsize[1] - y - 1) * self.tile_side_size, self.tile_side_size, self.tile_side_size))
 
-			if current_block.is_type(Tiles.SpringRightPressed) and entity.direction == Entities.Direction.RIGHT: # If entity leaves a left-facing spring
-				self.dimension[int(x+0.5)][int(y)] = current_block.become(Tiles.SpringRight)
-				self.need_build_map = True
-				self.play_sound('spring')
+			elif event.type == Simulation.EventType.TILE_PLACED:
+				self.play_sound('putTile')
 
-			if current_block.is_type(Tiles.SpringLeftPressed) and entity.direction == Entities.Direction.LEFT: # If entity leaves a left-facing spring
-				self.dimension[int(x+0.5)][int(y)] = current_block.become(Tiles.SpringLeft)
-				self.need_build_map = True
+			elif event.type == Simulation.EventType.SPRING_RELEASED:
 				self.play_sound('spring')
 
-			if current_block.is_one_types(Tiles.PortalBlue, Tiles.PortalRed, Tiles.PortalGreen) and entity.travelable_in_portals and not entity.just_travelled_in_portal: # Enter a portal
-				entity.just_travelled_in_portal = True # To avoid being reteleported immediatly when go out of the portal
-				type_of_portal = type(current_block)
-
-				portals_positions = searchTypeInMatrix(type_of_portal, self.dimension) # Search for portal with same color in the dimension
-				for portal in portals_positions:
-					if portal != current_block.coords:
-						entity.position = portal
-						exit_portal = self.dimension[portal[0]][portal[1]]
-						if entity.start_y: # If entity is falling (because of gravity) while it is teleported: change it's start_y value to take account of delta between Y of the two portals
-							entity.start_y += (exit_portal.coords[1] - current_block.coords[1])
-
-						if exit_portal.is_type(Tiles.PortalBlue): # Get textures for Portal color
-							textures = Effects.getTexturesFromDirectory('Ressources/Particles/BluePortal')
-						elif exit_portal.is_type(Tiles.PortalRed):
-							textures = Effects.getTexturesFromDirectory('Ressources/Particles/RedPortal')
-						if exit_portal.is_type(Tiles.PortalGreen):
-							textures = Effects.getTexturesFromDirectory('Ressources/Particles/GreenPortal')
-
-						effectOut = Effects.UniformEffect(exit_portal.position, textures, quantity = 5, radius_max = 3, age_max = 14, textures_alternating_mode = Effects.TextureAlternatingMode.TIMED)
-						self.effects.append(effectOut) # Add particles to exit portal
+			elif event.type == Simulation.EventType.TELEPORTED:
+				if event.tile is Tiles.PortalBlue: # Get textures for Portal color
+					textures = Effects.getTexturesFromDirectory('Ressources/Particles/BluePortal')
+				elif event.tile is Tiles.PortalRed:
+					textures = Effects.getTexturesFromDirectory('Ressources/Particles/RedPortal')
+				elif event.tile is Tiles.PortalGreen:
+					textures = Effects.getTexturesFromDirectory('Ressources/Particles/GreenPortal')
 
-						effectIn = Effects.UniformEffect(current_block.position, textures, quantity = 5, radius_max = 3, age_max = 14, textures_alternating_mode = Effects.TextureAlternatingMode.TIMED)
-						self.effects.append(effectIn) # Add particles to enter portal
+				for coords in (event.destination, event.origin):
+					position = (coords[0] * self.tile_side_size, (self.mapsize[1] - coords[1] - 1) * self.tile_side_size)
+					self.effects.spawn(Effects.UniformEffect, Effects.EffectPriority.NORMAL, position, textures, quantity = 5, radius_max = 3, age_max = 14, textures_alternating_mode = Effects.TextureAlternatingMode.TIMED) # Add particles to exit and enter portals
 
-						self.play_sound('teleport')
-						break
+				self.play_sound('teleport')
 
+			elif event.type == Simulation.EventType.ANTIMATTER_COLLECTED:
+				previous_images = self.antimatter_counter_images
+				self.antimatter_counter_images = self.render_antimatter_counter()
+				self.dirty_areas.extend(rect for image, rect in previous_images + self.antimatter_counter_images) # The text width may change
 
-
-
-
-			if not current_block.is_one_types(Tiles.PortalBlue, Tiles.PortalRed, Tiles.PortalGreen): # Exits the portal
-				entity.just_travelled_in_portal = False
-
-			if current_block.is_type(Tiles.Antimatter) and entity == self.zardow_entity: # Collect antimatter (only for Zardow)
-				self.collected_antimatter += 1
-				current_block = current_block.become(Tiles.Air)
-				self.dimension[int(x+0.5)][int(y)] = self.dimension[int(self.zardow_entity.position[0])][int(self.zardow_entity.position[1])].become(Tiles.Air)
-				if self.collected_antimatter == self.needed_antimatter:
+				if event.enough:
 					self.play_sound('enough antimatter')
 				else:
 					self.play_sound('antimatter')
-				self.need_build_map = True
-
-			if current_block.is_one_types(Tiles.Spikes, Tiles.SpikesDown): # If entity is on spikes: die
-				self.kill_entity(entity)
-				continue
 
-			if current_block.is_type(Tiles.Ladder): # If entity is on ladders
-				entity.position = (entity.position[0], entity.position[1] + 1)
-
-			if current_block.is_one_types(Tiles.ButtonUp, Tiles.ButtonDown) and not entity.just_pressed_button: # If entity is on antigravity button
-				self.anti_gravity = not self.anti_gravity
-				entity.just_pressed_button = True
-				for e in self.entities:
-					e.falling_time = 0
+			elif event.type == Simulation.EventType.GRAVITY_REVERSED:
 				self.play_sound('gravity')
 
-			if not current_block.is_one_types(Tiles.ButtonUp, Tiles.ButtonDown): # If entity is not on antigravity button anymore
-				entity.just_pressed_button = False
-
-
-
-
-
-			# Gravity
-			if entity.subject_gravity: # Is entity is subject to gravity
-
-				if not self.anti_gravity: # Normal gravity
-
-					y = entity.position[1]
-					y_to_test = math.ceil(y)-1
-
-					if y_to_test < 0 or y_to_test >= 20: # If entity vertically out of map: kill it
-						self.kill_entity(entity)
-						continue
-
-					bloc_to_test = self.dimension[math.floor(x+0.5)][y_to_test]
-
-					is_blocked_by_moving_box = False
-					for box in self.moving_boxes:
-						if box.position[0] == math.floor(x+0.5) and box.position[1] == y_to_test:
-							is_blocked_by_moving_box = True
-
-
-					if bloc_to_test.traversable and not bloc_to_test.is_type(Tiles.Ladder) and not current_block.is_one_types(Tiles.SpringLeft, Tiles.SpringLeftPressed, Tiles.SpringRight, Tiles.SpringRightPressed) and not is_blocked_by_moving_box:
-						if not entity.start_y:
-							entity.start_y = y
-
-						yGravity = entity.start_y - (0.5 * 19 * ((entity.falling_time/self.update_frequency) ** 2)) # y(t) = 1/2 gt^2 + y0 (here, g is 19)
-						entity.position = (entity.position[0], yGravity)
-						entity.falling_time += 1
-					else:
-						entity.falling_time = 0
-						entity.start_y = 0
-
-				else: # Anti gravity
-
-					y = entity.position[1]
-					y_to_test = math.floor(y)+1
-
-					if y_to_test < 0 or y_to_test >= 20: # If entity vertically out of map: kill it
-						self.kill_entity(entity)
-						continue
-
-					bloc_to_test = self.dimension[math.floor(x+0.5)][y_to_test]
-
-					is_blocked_by_moving_box = False
-					for box in self.moving_boxes:
-						if box.position[0] == math.floor(x+0.5) and box.position[1] == y_to_test:
-							is_blocked_by_moving_box = True
-
-
-					if bloc_to_test.traversable and not bloc_to_test.is_type(Tiles.Ladder) and not current_block.is_one_types(Tiles.SpringLeft, Tiles.SpringLeftPressed, Tiles.SpringRight, Tiles.SpringRightPressed) and not is_blocked_by_moving_box:
-						if not entity.start_y:
-							entity.start_y = y
-
-						yGravity = min(y_to_test+0.1, entity.start_y + (0.5 * 19 * ((entity.falling_time/self.update_frequency) ** 2)))# y(t) = 1/2 gt^2 + y0
-						entity.position = (entity.position[0], yGravity)
-						entity.falling_time += 1
-					else:
-						entity.falling_time = 0
-						entity.start_y = 0
+			elif event.type == Simulation.EventType.BOX_BROKEN:
+				boxes_broken = True
+				textures = Effects.getTexturesFromDirectory('Ressources/Particles/Breaking Box')
+				position_pixels = (event.coords[0] * self.tile_side_size, (self.mapsize[1] - event.coords[1]) * self.tile_side_size)
+				self.effects.spawn(Effects.GravityEffect, Effects.EffectPriority.HIGH, position_pixels, textures, 10,50)
 
+			elif event.type == Simulation.EventType.ENTITY_KILLED:
+				if event.entity == self.simulation.zardow_entity:
+					self.play_sound('lose')
 
-			entity.update(instance=self) # Entity specific behaviour update
-
-
-		### End entities behaviour
-
-
-
-		### Presenting effects and particles
-
-		for effect in self.effects:
-			effect.present()
-
-		### End effects presenting
-
+			elif event.type == Simulation.EventType.ROCKET_TAKING_OFF:
+				smoke_textures = Effects.getTexturesFromDirectory('Ressources/Particles/SmokeAndFire')
+				position = ((event.position[0] + 0.3) * self.tile_side_size, (self.mapsize[1] - event.position[1]) * self.tile_side_size)
+				self.effects.spawn(Effects.UniformEffect, Effects.EffectPriority.LOW, position, smoke_textures, quantity = 2, radius_max = 3, age_max = 3, textures_alternating_mode = Effects.TextureAlternatingMode.RANDOMLY)
 
-
-		### Zardow behaviour
-
-
-		if ((int(self.zardow_entity.position[0]) == int(self.rocket_entity.position[0])) and
-				(int(self.zardow_entity.position[1]) == int(self.rocket_entity.position[1])) and
-				(self.zardow_entity in self.entities)): # If Zardow on the rocket
-
-			if self.collected_antimatter == self.needed_antimatter: # Enough antimatter and : win
-				self.rocket_entity.zardow_is_in = True
-				self.entities.remove(self.zardow_entity)
+			elif event.type == Simulation.EventType.LEVEL_WON:
 				self.play_sound('rocket')
 				self.level_won = True
-			else:
-				self.kill_entity(self.zardow_entity)
+				self.prefetch_next_level()
 
+		if boxes_broken:
+			self.play_sound('breakingBox')
 
-		if self.zardow_entity.dead or self.rocket_entity.dead: # If any Zardow or the rocket (normally not happening) die
-			self.load_level(self.level_path)
 
-		### Zardow behaviour
 
+	def prefetch_next_level(self):
+		'''
+		Start preparing the level following the current one in the level pack, so it starts without delay when the player clicks Next.
+		'''
+		next_level = self.level_catalog.get_next(self.level_path)
+		if next_level is not None and 'animation' not in next_level:
+			self.prefetcher.prefetch(next_level['path'])
 
-		self.refresh_display()
+	def render_antimatter_counter(self):
+		'''
+		Render the amount of collected antimatter, displayed at the top of the level.
+		Returns:
+		   [ (pygame.Surface, pygame.Rect), ... ] : The images (text and icon) and their position on the level surface, nothing if the level needs no antimatter
+		'''
+		if not self.simulation.needed_antimatter:
+			return []
 
+		text = render_text('{collected}/{total}'.format(collected = self.simulation.collected_antimatter, total = self.simulation.needed_antimatter), 32)
+		text_rect = text.get_rect(topleft = (self.window_size - 3 * (32 + 32) - 24 - text.get_width() , 29))
 
+		antimatterImage = load_image('./Ressources/Hud/antimatter.png',(32, 32))
+		antimatter_rect = antimatterImage.get_rect(topleft = (self.window_size - 4 * (32 + 32) - text.get_width(), 35))
 
+		return [(text, text_rect), (antimatterImage, antimatter_rect)]
 
-	def kill_entity(self, entity):
+	def draw_level_surface(self, area = None):
 		'''
-		Kill an entity.
-		Invoke entity.kill but prepare the game to make it more efficient, and to check if the killed entity is Zardow (then play the "you lose" sound).
+		Draw the background, the tiles, the level message and the antimatter counter on self.level_surface.
 		Parameters:
-		   entity (Entities.Entity) : The entity to kill, to remove of the game
+		   area (pygame.Rect) : The part of the level surface to redraw, nothing is drawn outside of it. Default: the whole surface
 		'''
-		entity.kill()
-		if entity == self.zardow_entity:
-			self.play_sound('lose')
-		self.entities.remove(entity)
+		if area is None:
+			area = self.level_surface.get_rect()
+		self.level_surface.set_clip(area)
+
+		self.level_surface.blit(self.level_image,(0, 0))
+
+		# Only the tiles overlapping the area
+		tile_size = (self.tile_side_size, self.tile_side_size)
+		columns = range(max(0, area.left // self.tile_side_size), min(self.mapsize[0], (area.right - 1) // self.tile_side_size + 1))
+		rows = range(max(0, area.top // self.tile_side_size), min(self.mapsize[1], (area.bottom - 1) // self.tile_side_size + 1))
+		for x in columns:
+			for row in reversed(rows):
+				tileId = self.simulation.tiles.item(x, self.mapsize[1] - row - 1)
+				image = Tiles.get_descriptor(Tiles.identifiers[tileId], tile_size).image
+				self.level_surface.blit(image, (x * self.tile_side_size, row * self.tile_side_size))
 
-		if entity in self.moving_boxes:
-			self.moving_boxes.remove(entity)
+		# Display a message if there is a message
+		for message_image, message_rect in self.level_message_images:
+			self.level_surface.blit(message_image, message_rect)
 
+		# Display the amount of antimatter (if needed)
+		for image, rect in self.antimatter_counter_images:
+			self.level_surface.blit(image, rect)
 
+		self.level_surface.set_clip(None)
 
 	def refresh_display(self):
 		'''
 		This function if responsible of the display refreshing.
 		First, we will refresh the tilemap. This step may take some time, so we only do it if self.need_build_map is True, only if the tilemap NEEDS to be redrawn.
+		Otherwise, only the parts of the tilemap listed in self.dirty_areas (changed tiles, antimatter counter) are redrawn.
+		Then only the changed parts of the window are pushed to the screen: dirty areas, and everything drawn at this refresh or at the previous one.
 		Then, we draw entities, visual effects, toolbox and GUIs depending on the status of the game (in game, in menu, paused, win)
+		While paused nothing moves: if no tile changed and the mouse didn't enter or leave a button, the window already shows the right image and nothing is done.
 		/!\ If selecting level, this function don't be called, but show_level_chooser will.
 		'''
 
+		overlays = self.get_overlays()
+		overlays_state = [(overlay, overlay.get_state(self.mouse_position)) for overlay in overlays]
 
+		if self.pause and overlays_state == self.overlays_state and not (self.need_build_map or self.dirty_areas):
+			return
+		self.overlays_state = overlays_state
 
 		#self.surface.fill((255, 255, 255))
-		pygame.display.update()
 
 		# Rebuild map if needed
 
 		if self.need_build_map:
-			self.level_surface.blit(self.level_image,(0, 0))
-
-			for x,subdim in enumerate(self.dimension):
-				for y,bloc in reversedEnumerate(subdim):
-					bloc.position = (x * self.tile_side_size, y * self.tile_side_size)
-					rect = bloc.position + bloc.rect
-					self.level_surface.blit(bloc.image, rect)
-
+			self.draw_level_surface()
 			self.need_build_map = False
 
-			# Display a message if there is a message
-			if len(self.level_message) > 0:
-				font_baloo48 = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 48)
-				message_line_1 = font_baloo48.render(self.level_message[0], True, (255, 255, 255))
-				message_line_1_rect = message_line_1.get_rect(center = (self.level_surface.get_width() / 2, self.level_surface.get_height() / 4))
-				self.level_surface.blit(message_line_1, message_line_1_rect)
-
-			if len(self.level_message) > 1:
-				message_line_2 = font_baloo48.render(self.level_message[1], True, (255, 255, 255))
-				message_line_2_rect = message_line_2.get_rect(center = (self.level_surface.get_width() / 2, self.level_surface.get_height() / 4 + 48))
-				self.level_surface.blit(message_line_2, message_line_2_rect)
-
-			# Display the amount of antimatter (if needed)
-			if self.needed_antimatter:
-				font_baloo32 = pygame.font.Font('./Ressources/Fonts/Baloo.ttf', 32)
-				text = font_baloo32.render('{collected}/{total}'.format(collected = self.collected_antimatter, total = self.needed_antimatter), True, (255, 255, 255))
-				self.level_surface.blit(text, (self.window_size - 3 * (32 + 32) - 24 - text.get_width() , 29))
-
-				antimatterImage = load_image('./Ressources/Hud/antimatter.png',(32, 32))
-				self.level_surface.blit(antimatterImage, (self.window_size - 4 * (32 + 32) - text.get_width(), 35))
-
+			self.surface.blit(self.level_surface, self.surface.get_rect())
+			updated_rects = [self.surface.get_rect()]
+		else:
+			for area in self.dirty_areas:
+				self.draw_level_surface(area)
 
+			# Erase what has been drawn at the last refresh: then the window is the same as the level surface again
+			updated_rects = self.dirty_areas + self.drawn_rects
+			for rect in updated_rects:
+				self.surface.blit(self.level_surface, rect, rect)
 
-		self.surface.blit(self.level_surface, self.surface.get_rect())
+		self.dirty_areas = []
+		drawn_rects = [] # Everything drawn above the level surface
 
 
 		# Draw entities
 
-		for entity in self.entities:
-			image = entity.get_image(self.anti_gravity)
+		for entity in self.simulation.entities:
+			image = entity.get_image(self.simulation.anti_gravity)
 			w = image.get_width()
 			h = image.get_height()
 			x, y = entity.position
 			anchor_point = (entity.anchor_point[0] * Entities.Entity.image_side, entity.anchor_point[1] * Entities.Entity.image_side)
-			position = (x * self.tile_side_size - anchor_point[0], (len(self.dimension) - y - 1) * self.tile_side_size - anchor_point[1]) # Position in-window to display the entity at
+			position = (x * self.tile_side_size - anchor_point[0], (self.mapsize[1] - y - 1) * self.tile_side_size - anchor_point[1]) # Position in-window to display the entity at
 			rect = position + (w, h)
-			self.surface.blit(image, rect)
+			drawn_rects.append(self.surface.blit(image, rect))
 
 			#pygame.draw.circle(self.surface, (255,0,0) , (int(position[0]),int(position[1])), 5) # For debugging
 
@@ -582,120 +540,37 @@ class Zardow(object):
 		# Draw toolbox
 
 		if self.toolbox.items:
-			self.toolbox.draw(self.surface)
+			drawn_rects.append(self.toolbox.draw(self.surface))
 
 		# Draw particles
 
-		for effect in self.effects:
-			effect.show(self.surface)
+		drawn_rects.extend(self.effects.show(self.surface))
 
 
 		# GUIs
 
-		# If Menu level; place title and buttons
-		if self.is_menu:
-			title_image = load_image('Ressources/Hud/menuTitleWithoutZardow.png',(515,144))
-			width = 10 * self.tile_side_size
-			height = int(width * (322 / 2272))
-			title_image = pygame.transform.scale(title_image, (width, height))
-
-			title_image = self.surface.blit(title_image,(
-				5 * self.tile_side_size,
-				2 * self.tile_side_size
-			))
-
-
-			button_width = 256
-			button_height = 64
-
-			self.play_button_rect =  pygame.Rect((self.level_surface.get_width() / 2) - (button_width / 2), 3/8*self.window_size, button_width, button_height)
-
-			if self.play_button_rect.collidepoint(self.mouse_position):
-				play_button_image = load_image('Ressources/Hud/playButtonHover.png',(button_width,button_height))
-			else:
-				play_button_image = load_image('Ressources/Hud/playButton.png',(button_width,button_height))
-			self.surface.blit(play_button_image,self.play_button_rect)
-
-
-		if self.level_won: # Refresh while "You Win" screen
-			image = pygame.Surface((self.surface.get_width(),self.surface.get_height()))
-			image.set_alpha(128)
-			image.fill((0,0,0))
-			self.surface.blit(image,(0,0))
-
-			won_title_image = load_image('Ressources/Hud/wonTitle.png',(629,150))
-			self.surface.blit(won_title_image,(
-				(self.level_surface.get_width() / 2) - (won_title_image.get_width() / 2)-12,
-				self.level_surface.get_height()/4
-			))
-
-			button_width = 256
-			button_height = 64
-
-			self.next_button_rect =  pygame.Rect((self.level_surface.get_width() / 2) - (button_width / 2), self.window_size/2, button_width, button_height)
-
-			if self.next_button_rect.collidepoint(self.mouse_position):
-				next_button_image = load_image('Ressources/Hud/nextButtonHover.png',(button_width,button_height))
-			else:
-				next_button_image = load_image('Ressources/Hud/nextButton.png',(button_width,button_height))
-			self.surface.blit(next_button_image,self.next_button_rect)
-
-		if self.pause: # Refresh while in pause
-			image = pygame.Surface((self.surface.get_width(),self.surface.get_height()))
-			image.set_alpha(128)
-			image.fill((0,0,0))
-			self.surface.blit(image,(0,0))
-
-			pause_title_image = load_image('Ressources/Hud/pauseTitle.png',(629,150))
-			self.surface.blit(pause_title_image,(
-				(self.level_surface.get_width() / 2) - (pause_title_image.get_width() / 2)-12,
-				self.level_surface.get_height()/4
-			))
-
-			button_width = 256
-			button_height = 64
-
-			self.resume_button_rect =  pygame.Rect((self.level_surface.get_width() / 2) - (button_width / 2), self.window_size/2, button_width, button_height)
-
-			if self.resume_button_rect.collidepoint(self.mouse_position):
-				resume_button_image = load_image('Ressources/Hud/resumeButtonHover.png',(button_width,button_height))
-			else:
-				resume_button_image = load_image('Ressources/Hud/resumeButton.png',(button_width,button_height))
-			self.surface.blit(resume_button_image,self.resume_button_rect)
-
-
-		# In-game buttons
-
-		retryButtonImage = load_image('Ressources/Hud/retry.png',(32,38))
-		self.retry_button_rect = pygame.Rect(self.window_size - 32 - 32 , 32, retryButtonImage.get_width(), retryButtonImage.get_height() )
-		if (not self.is_menu) and (not self.level_won):
-			# Draw retry button
-			self.surface.blit(retryButtonImage,self.retry_button_rect)
-
-		pauseButtonImage = load_image('Ressources/Hud/pauseButton.png',(32,38))
-		self.pause_button_rect = pygame.Rect(self.window_size - 2 * (32 + 32), 32, pauseButtonImage.get_width(), pauseButtonImage.get_height() )
-		if (not self.is_menu) and (not self.level_won):
-			# Draw retry button
-			self.surface.blit(pauseButtonImage,self.pause_button_rect)
-
-		menuButtonImage = load_image('Ressources/Hud/menuButton.png',(32,38))
-		self.menu_button_rect = pygame.Rect(self.window_size - 3 * (32 + 32), 32, menuButtonImage.get_width(), menuButtonImage.get_height() )
-		if (not self.is_menu) and (not self.level_won):
-			# Draw retry button
-			self.surface.blit(menuButtonImage,self.menu_button_rect)
-
+		for overlay in overlays:
+			drawn_rects.extend(overlay.draw(self.surface, self.mouse_position))
 
 
 		# Update the display
-		pygame.display.flip() # At the end of refresh_display
+		self.drawn_rects = drawn_rects
+		pygame.display.update(updated_rects + drawn_rects) # At the end of refresh_display
 
 	def show_level_chooser(self):
 		'''
 		"Hook" of refresh_display but if user is choosing a level in the level selector.
 		This doesn't appears on refresh_display because refresh_display is called every update and this will be called every occurence of the mainloop (since level choosing is not very ressources heavy and need to be fluid)
+		The display is only flipped when the level chooser has changed (scrolled or new items), and the loop is capped to 60 occurences per second while choosing.
 		'''
-		self.level_chooser.draw(self.surface)
-		pygame.display.flip()
+		self.clock.tick(60)
+
+		if self.level_chooser.draw(self.surface):
+			pygame.display.flip()
+
+		hovered_level_index = self.level_chooser.select(self.mouse_position)
+		if hovered_level_index != None: # The player will probably click on it
+			self.prefetcher.prefetch(self.level_chooser.items[hovered_level_index]['path'])
 
 
 	def mainloop(self):
@@ -738,22 +613,8 @@ class Zardow(object):
 
 					else:
 						if keys_down[pygame.K_SPACE]: # If SPACE key is pressed:
-							boxes = searchTypeInMatrix(Tiles.Box, self.dimension)
-							play_sound = False
-							for box_to_break_position in boxes: # Search for every boxes in the level
-								play_sound = True
-								box = self.dimension[box_to_break_position[0]][box_to_break_position[1]].become(Tiles.Air)
-								self.dimension[box_to_break_position[0]][box_to_break_position[1]] =  box# Replace the box by a broken box
-
-								textures = Effects.getTexturesFromDirectory('Ressources/Particles/Breaking Box')
-								position_pixels = (box_to_break_position[0] * self.tile_side_size, (self.mapsize[1] - box_to_break_position[1]) * self.tile_side_size)
-								particle = Effects.GravityEffect(position_pixels, textures, 10,50)
-								self.effects.append(particle)
-
-								self.need_build_map = True # Need to refresh the map
-
-							if play_sound:
-								self.play_sound('breakingBox')
+							self.simulation.break_boxes()
+							self.present_events(self.simulation.pop_events())
 
 						elif keys_down [pygame.K_r] and not self.is_menu: # If user press R key, restart level
 							self.load_level(self.level_path)
@@ -795,44 +656,33 @@ class Zardow(object):
 							self.play_sound('hover')
 							self.is_menu = False
 							self.is_choosing_level = True
-							with open('LevelPack.json','r') as levelPackJson:
-								levels = json.loads(levelPackJson.read())['Levels']
-
-							self.level_chooser.items = levels
+							self.level_chooser.items = self.level_catalog.get_levels()
 							#self.load_level('1')
 
 					elif self.level_won: # Clicked on "You win" screen
 						if self.next_button_rect.collidepoint(self.mouse_position): # Next level button
 							self.play_sound('hover')
 
-							with open('LevelPack.json','r') as levelPackJson:
-								levels = json.loads(levelPackJson.read())['Levels']
-
-							for index,level in enumerate(levels):
-								if level['path'] == self.level_path:
-									next_level = levels[index+1]
-									if 'animation' in next_level: # Next "level" is an animatio
-										path = next_level['path']
-										images_name = next_level['images']
-										images = map(lambda img_name: os.path.join(path, img_name), images_name)
-										if 'music' in next_level:
-											self.play_music(next_level['music'])
-										animation = Effects.Animation(list(images), self.window_size, image_duration = 2, repeat = False, completion = self.reset_game, hide_cursor = True)
-										self.effects.append(animation)
-										self.level_won = False
-										self.pause = False
-									else: # Next level is a basic level
-										self.load_level(levels[index+1]['path'])
-										break
+							next_level = self.level_catalog.get_next(self.level_path)
+							if next_level is None: # Last entry of the pack
+								pass
+							elif 'animation' in next_level: # Next "level" is an animatio
+								path = next_level['path']
+								images_name = next_level['images']
+								images = map(lambda img_name: os.path.join(path, img_name), images_name)
+								if 'music' in next_level:
+									self.play_music(next_level['music'])
+								animation = Effects.Animation(list(images), self.window_size, image_duration = 2, repeat = False, completion = self.reset_game, hide_cursor = True, buffer_size = 4)
+								self.effects.add(animation, Effects.EffectPriority.HIGH)
+								self.level_won = False
+								self.pause = False
+							else: # Next level is a basic level
+								self.load_level(next_level['path'])
 
 					elif self.is_choosing_level: # Clicked on the level selector
 						selected_level_index = self.level_chooser.select(self.mouse_position)
 						if selected_level_index != None:
-
-							with open('LevelPack.json','r') as levelPackJson:
-								levels = json.loads(levelPackJson.read())['Levels']
-
-							level = levels[selected_level_index]
+							level = self.level_chooser.items[selected_level_index]
 							self.is_choosing_level = False
 							self.load_level(level['path'])
 
@@ -859,14 +709,12 @@ class Zardow(object):
 						else: # Clicked anywhere else on the window
 							# Determine the ingame-coordinates for the click position
 							x = int(x_click / self.tile_side_size)
-							y = len(self.dimension) - int(y_click / self.tile_side_size) - 1
+							y = self.mapsize[1] - int(y_click / self.tile_side_size) - 1
 
-							if self.dimension[x][y].is_type(Tiles.TileTarget) and not (x == int(self.zardow_entity.position[0]) and y == int(self.zardow_entity.position[1])): # If clicked tile is a target tile
-								self.dimension[x][y] = self.toolbox.selected_item(size = (self.tile_side_size,self.tile_side_size), coords = (x, y)) # Replace the target tile by the selected tile
+							if self.toolbox.selected_item and self.simulation.place_tile((x, y), self.toolbox.selected_item): # If clicked tile is a target tile, replace it by the selected tile
 								self.toolbox.items[self.toolbox.selected_slot] = None # After having placed the tile, we remove it from the toolbox
 								self.toolbox.sort()
-								self.need_build_map = True # After replacing the tile, we need to refresh the display of the map
-								self.play_sound('putTile')
+								self.present_events(self.simulation.pop_events())
 
 
 
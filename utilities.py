@@ -5,14 +5,535 @@
 ################################################## UTILITIES.PY
 ##################################################
 import pygame
+import os
+import mmap
+import struct
+import hashlib
+import threading
+import collections
+import importlib.util
 
-global alreadyImportedImages
-alreadyImportedImages = {}
+class ImageCache(object):
+	'''
+	Cache of the images loaded with load_image, keyed by path and size.
+	It keeps at most budget bytes of images: when it is full, the least recently used images are forgotten (they will be loaded again from file if needed).
+	Pinned images (core sprites, HUD...) are never forgotten.
+	'''
+	def __init__(self, budget = 128 * 1024 * 1024):
+		'''
+		Parameters:
+			- budget (int) : The maximum size of the cached images, in bytes
+		'''
+		self.budget = budget
+
+		self.images = collections.OrderedDict() # {(path, size): pygame.Surface}, least recently used first
+		self.sizes = {} # {(path, size): size of the image in bytes}
+		self.used_bytes = 0
+		self.pinned_paths = [] # Normalized paths (files or directories) of the images that are never forgotten
+
+		self.format = None # Pixel format of the display the images are converted to (None if they are not converted)
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __contains__(self, key):
+		return key in self.images
+
+	def get(self, key):
+		'''
+		Parameters:
+			- key (tuple(path, size)) : The image key
+		Returns:
+			- pygame.Surface : The cached image, None if it is not cached
+		'''
+		image = self.images.get(key)
+		if image is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+			self.images.move_to_end(key)
+		return image
+
+	def put(self, key, image):
+		'''
+		Add (or replace) an image, then forget the least recently used images if the cache is over budget.
+		Parameters:
+			- key (tuple(path, size)) : The image key
+			- image (pygame.Surface) : The image
+		'''
+		self.discard(key)
+		self.images[key] = image
+		self.sizes[key] = get_image_bytes(image)
+		self.used_bytes += self.sizes[key]
+
+		for old_key in list(self.images):
+			if self.used_bytes <= self.budget:
+				break
+			if old_key != key and not self.is_pinned(old_key[0]):
+				self.discard(old_key)
+				self.evictions += 1
+
+	def discard(self, key):
+		'''
+		Forget an image if it is cached.
+		'''
+		if key in self.images:
+			del self.images[key]
+			self.used_bytes -= self.sizes.pop(key)
+
+	def pin(self, path):
+		'''
+		Never forget the images of a file, or of every file in a directory.
+		Parameters:
+			- path (str) : The path of the file or directory
+		'''
+		self.pinned_paths.append(os.path.normpath(path))
+
+	def is_pinned(self, path):
+		'''
+		Returns:
+			- bool : True if the images of this file are never forgotten
+		'''
+		return is_in_paths(path, self.pinned_paths)
+
+	def convert(self):
+		'''
+		Convert every image to the pixel format of the display, if it changed since the last conversion (see convert_image).
+		Returns:
+			- bool : True if the images have been converted
+		'''
+		display_format = get_display_format()
+		if display_format is None or display_format == self.format:
+			return False
+
+		for key, image in self.images.items():
+			image = convert_image(image)
+			self.images[key] = image
+			self.used_bytes -= self.sizes[key]
+			self.sizes[key] = get_image_bytes(image)
+			self.used_bytes += self.sizes[key]
+		self.format = display_format
+		return True
+
+	def get_stats(self):
+		'''
+		Returns:
+			- dict : Number of cached images, used bytes, budget, hits, misses and evictions since the beginning
+		'''
+		return {'images': len(self.images), 'used_bytes': self.used_bytes, 'budget': self.budget, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class TextureAtlas(object):
+	'''
+	Packs small images (sprites, particles, HUD) in a few large sheets, row by row.
+	Each packed image is a subsurface of a sheet: the game draws from a few big sources instead of hundreds of small surfaces.
+	Only images with per-pixel transparency from the included directories are packed, once a display is open (sheets have its pixel format).
+	The atlas owns the packed images: they are never forgotten (they are not in importedImages, whose budget doesn't count them), so only include directories of small, always used images.
+	'''
+	def __init__(self, sheet_size = 1024):
+		'''
+		Parameters:
+			- sheet_size (int) : The width and height of each sheet, in pixels
+		'''
+		self.sheet_size = sheet_size
+		self.included_paths = [] # Normalized paths (files or directories) of the images to pack
+		self.clear()
+
+	def clear(self):
+		'''
+		Forget every sheet (images already returned by add stay valid).
+		'''
+		self.sheets = []
+		self.rects = {} # {(path, size): (index of the sheet, pygame.Rect in the sheet)}
+		self.images = {} # {(path, size): subsurface of the sheet}
+
+		# Position of the next image: images are placed left to right on rows (shelves) as high as their highest image
+		self.shelf_x = self.shelf_y = self.shelf_height = 0
+
+	def include(self, path):
+		'''
+		Pack the images of a file, or of every file in a directory.
+		Parameters:
+			- path (str) : The path of the file or directory
+		'''
+		self.included_paths.append(os.path.normpath(path))
+
+	def accepts(self, path, image):
+		'''
+		Returns:
+			- bool : True if the image can be packed
+		'''
+		return (image.get_flags() & pygame.SRCALPHA and max(image.get_size()) <= self.sheet_size
+				and get_display_format() is not None and is_in_paths(path, self.included_paths))
+
+	def get(self, key):
+		'''
+		Returns:
+			- pygame.Surface : The packed image (subsurface of a sheet), None if it isn't packed
+		'''
+		return self.images.get(key)
+
+	def add(self, key, image):
+		'''
+		Copy an image in a sheet (see accepts).
+		An image packed again under the same key (imported again with force_import) takes the place of the previous one if it has the same size, otherwise it is packed elsewhere.
+		Parameters:
+			- key (tuple(path, size)) : The image key
+			- image (pygame.Surface) : The image to pack
+		Returns:
+			- pygame.Surface : The packed image, a subsurface of a sheet
+		'''
+		width, height = image.get_size()
+
+		if key in self.rects:
+			index, rect = self.rects[key]
+			if rect.size == (width, height): # Same place: the subsurfaces already returned show the new image
+				sheet = self.sheets[index]
+				sheet.fill((0, 0, 0, 0), rect)
+				sheet.blit(image, rect, special_flags = pygame.BLEND_RGBA_MAX)
+				return self.images[key]
+
+			del self.rects[key]
+			del self.images[key]
+
+		if self.shelf_x + width > self.sheet_size: # Next shelf
+			self.shelf_x = 0
+			self.shelf_y += self.shelf_height
+			self.shelf_height = 0
+
+		if not self.sheets or self.shelf_y + height > self.sheet_size: # Next sheet
+			self.sheets.append(pygame.Surface((self.sheet_size, self.sheet_size), pygame.SRCALPHA).convert_alpha())
+			self.shelf_x = self.shelf_y = self.shelf_height = 0
+
+		sheet = self.sheets[-1]
+		rect = pygame.Rect(self.shelf_x, self.shelf_y, width, height)
+		sheet.blit(image, rect, special_flags = pygame.BLEND_RGBA_MAX) # On transparent black, copies the pixels as they are (a normal blit would blend them)
+
+		self.shelf_x += width
+		self.shelf_height = max(self.shelf_height, height)
+
+		self.rects[key] = (len(self.sheets) - 1, rect)
+		self.images[key] = sheet.subsurface(rect)
+		return self.images[key]
+
+	def get_stats(self):
+		'''
+		Returns:
+			- dict : Number of packed images, number of sheets and bytes used by the sheets
+		'''
+		return {'images': len(self.images), 'sheets': len(self.sheets), 'used_bytes': sum(get_image_bytes(sheet) for sheet in self.sheets)}
+
+class DiskImageCache(object):
+	'''
+	Persistent cache of decoded and scaled images, so the game doesn't decode and scale every PNG again at each launch.
+	Pixels are stored raw in files named after the path of the source file and the size, and read back through a memory map.
+	Each cache file also stores the hash of its source file: when the source is modified, the cache file doesn't match anymore and is overwritten.
+	The cache files take at most budget bytes on disk (the oldest ones are deleted), and images of excluded paths (big animation frames) are never cached.
+	'''
+	header = struct.Struct('<4sHH?20s') # Magic, width, height, has alpha channel, hash of the source file
+	magic = b'ZIM2'
+
+	def __init__(self, directory, budget = 256 * 1024 * 1024):
+		'''
+		Parameters:
+			- directory (str) : The directory of the cache files (created if needed)
+			- budget (int) : The maximum size of the cache files, in bytes
+		'''
+		self.directory = directory
+		self.budget = budget
+		self.enabled = True # Set to False when the cache files can't be written
+		self.excluded_paths = [] # Normalized paths (files or directories) of the images never cached
+
+		self.lock = threading.Lock() # Images can be loaded by several threads (see Prefetcher and Effects.Animation)
+		self.file_hashes = {} # {path: ((modification time, size), hash)} for the files already hashed by this process
+		self.used_bytes = None # Size of the cache files, computed at the first write
+
+	def exclude(self, path):
+		'''
+		Never cache the images of a file, or of every file in a directory.
+		Parameters:
+			- path (str) : The path of the file or directory
+		'''
+		self.excluded_paths.append(os.path.normpath(path))
+
+	def get_file_hash(self, path):
+		'''
+		Returns:
+			- bytes : The hash of the content of a file (only computed again if the file changed)
+		'''
+		stat = os.stat(path)
+		signature = (stat.st_mtime_ns, stat.st_size)
+
+		with self.lock:
+			known = self.file_hashes.get(path)
+		if known is not None and known[0] == signature:
+			return known[1]
+
+		with open(path, 'rb') as source_file:
+			file_hash = hashlib.sha1(source_file.read()).digest()
+		with self.lock:
+			self.file_hashes[path] = (signature, file_hash)
+		return file_hash
+
+	def get_cache_path(self, path, size):
+		'''
+		Returns:
+			- str : The path of the cache file of an image at a size
+		'''
+		size_name = '%ix%i'%tuple(size) if size else 'original'
+		path_hash = hashlib.sha1(os.path.normpath(path).encode()).hexdigest()
+		return os.path.join(self.directory, '{hash}_{size}.raw'.format(hash = path_hash, size = size_name))
+
+	def load(self, path, size = None):
+		'''
+		Get an image from the cache, or decode it (and cache it).
+		Parameters:
+			- path (str) : The path of the image file
+			- size (tuple(Int, Int)) : The size of the image, None for its original size
+		Returns:
+			- pygame.Surface : The image (not converted to the display pixel format)
+		'''
+		if is_in_paths(path, self.excluded_paths) or (size and 0 in size): # Empty images (like the rocket after take-off) have no pixels to cache
+			return self.decode(path, size)
+
+		try:
+			file_hash = self.get_file_hash(path)
+		except OSError: # Let pygame report the missing file
+			return self.decode(path, size)
+
+		cache_path = self.get_cache_path(path, size)
+		image = self.read(cache_path, file_hash)
+		if image is None:
+			image = self.decode(path, size)
+			self.write(cache_path, image, file_hash)
+		return image
+
+	def decode(self, path, size = None):
+		'''
+		Returns:
+			- pygame.Surface : The image decoded from its file, scaled to size
+		'''
+		image = pygame.image.load(path)
+
+		if size:
+			image = pygame.transform.scale(image, size)
+		return image
+
+	def read(self, cache_path, file_hash):
+		'''
+		Returns:
+			- pygame.Surface : The image of a cache file, None if there is no valid cache file for this version of the source file
+		'''
+		try:
+			with open(cache_path, 'rb') as cache_file, mmap.mmap(cache_file.fileno(), 0, access = mmap.ACCESS_READ) as pixels:
+				magic, width, height, alpha, source_hash = self.header.unpack_from(pixels)
+				image_format = 'RGBA' if alpha else 'RGB'
+				if magic != self.magic or source_hash != file_hash or len(pixels) != self.header.size + width * height * len(image_format):
+					return None
+
+				with memoryview(pixels) as view:
+					return pygame.image.frombuffer(view[self.header.size:], (width, height), image_format).copy() # Copy: the memory map is closed after
+		except (OSError, ValueError, struct.error):
+			return None
+
+	def write(self, cache_path, image, file_hash):
+		'''
+		Write the cache file of an image (replacing the one of a previous version of the source file), then delete the oldest cache files if they take more than budget bytes.
+		Palette images (with a colorkey) are never cached: their transparency would be lost, and neither are empty images.
+		'''
+		if not self.enabled or image.get_bitsize() < 24 or image.get_colorkey() is not None or 0 in image.get_size():
+			return
+
+		alpha = bool(image.get_flags() & pygame.SRCALPHA)
+		try:
+			os.makedirs(self.directory, exist_ok = True)
+			with self.lock:
+				if self.used_bytes is None:
+					self.used_bytes = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.raw'))
+				previous_size = os.path.getsize(cache_path) if os.path.exists(cache_path) else 0
+
+			temporary_path = '{path}.{process}.{thread}.tmp'.format(path = cache_path, process = os.getpid(), thread = threading.get_ident()) # Unique for every thread of every launch of the game or the level maker
+			with open(temporary_path, 'wb') as cache_file:
+				cache_file.write(self.header.pack(self.magic, image.get_width(), image.get_height(), alpha, file_hash))
+				cache_file.write(pygame.image.tobytes(image, 'RGBA' if alpha else 'RGB'))
+				size = cache_file.tell()
+			os.replace(temporary_path, cache_path) # A cache file is never read half written
+
+			with self.lock:
+				self.used_bytes += size - previous_size
+				if self.used_bytes > self.budget:
+					self.trim(keep = cache_path)
+		except OSError as e:
+			print ('Error "{e}" while writing the image cache, images won\'t be cached anymore'.format(e = e))
+			self.enabled = False
+
+	def trim(self, keep = None):
+		'''
+		Delete the oldest cache files until they take at most budget bytes. self.lock must be held.
+		Parameters:
+			- keep (str) : The path of a cache file never deleted (the one just written)
+		'''
+		entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith('.raw')), key = lambda entry: entry.stat().st_mtime_ns)
+		self.used_bytes = sum(entry.stat().st_size for entry in entries)
+
+		for entry in entries:
+			if self.used_bytes <= self.budget:
+				break
+			if entry.path == keep:
+				continue
+			try:
+				size = entry.stat().st_size
+				os.remove(entry.path)
+				self.used_bytes -= size
+			except OSError: # Already deleted by another launch of the game
+				pass
+
+class FontRegistry(object):
+	'''
+	Fonts opened with load_font, keyed by file and size, so a font file is only parsed once per size.
+	'''
+	def __init__(self):
+		self.fonts = {} # {(normalized path, size): pygame.font.Font}
+
+	def get(self, path, size):
+		'''
+		Parameters:
+			- path (str) : The path of the font file
+			- size (int) : The size of the font
+		Returns:
+			- pygame.font.Font : The font, opened at the first call
+		'''
+		key = (os.path.normpath(path), size)
+		font = self.fonts.get(key)
+		if font is None:
+			font = pygame.font.Font(path, size)
+			self.fonts[key] = font
+		return font
+
+class TextCache(object):
+	'''
+	Cache of the texts rendered with render_text, keyed by font, size, text and colour.
+	It keeps at most capacity texts: when it is full, the least recently used texts are forgotten.
+	The cached surfaces are shared: blit them, never draw on them.
+	'''
+	def __init__(self, fonts, capacity = 256):
+		'''
+		Parameters:
+			- fonts (FontRegistry) : Where the fonts are taken from
+			- capacity (int) : The maximum number of cached texts
+		'''
+		self.fonts = fonts
+		self.capacity = capacity
+
+		self.texts = collections.OrderedDict() # {(normalized font path, size, text, antialias, color): pygame.Surface}, least recently used first
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def render(self, text, size, color, font_path, antialias = True):
+		'''
+		Parameters: see render_text
+		Returns:
+			- pygame.Surface : The rendered text, from the cache if it was already rendered
+		'''
+		key = (os.path.normpath(font_path), size, text, antialias, tuple(color))
+
+		image = self.texts.get(key)
+		if image is not None:
+			self.hits += 1
+			self.texts.move_to_end(key)
+			return image
+
+		self.misses += 1
+		image = self.fonts.get(font_path, size).render(text, antialias, color)
+		self.texts[key] = image
+
+		while len(self.texts) > self.capacity:
+			self.texts.popitem(last = False)
+			self.evictions += 1
+
+		return image
+
+	def get_stats(self):
+		'''
+		Returns:
+			- dict : Number of cached texts, capacity, hits, misses and evictions since the beginning
+		'''
+		return {'texts': len(self.texts), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+global importedImages
+importedImages = ImageCache() # Every images loaded with load_image
+
+global decodedImages
+decodedImages = DiskImageCache(os.path.join(os.path.expanduser('~'), '.cache', 'Zardow', 'images')) # Decoded images, kept between launches
+
+global spritesAtlas
+spritesAtlas = TextureAtlas() # Images loaded with load_image from the included paths
+
+global loadedFonts
+loadedFonts = FontRegistry() # Every fonts opened with load_font
+
+global renderedTexts
+renderedTexts = TextCache(loadedFonts) # Texts rendered with render_text
+
+def is_in_paths(path, paths):
+	'''
+	Parameters:
+		- path (str) : The path of a file
+		- paths ([str, ...]) : Normalized paths of files or directories
+	Returns:
+		- bool : True if the file is one of paths, or is in one of these directories
+	'''
+	path = os.path.normpath(path)
+	return any(path == other or path.startswith(other + os.sep) for other in paths)
+
+def get_image_bytes(image):
+	'''
+	Returns:
+		- int : The memory used by the pixels of an image
+	'''
+	return image.get_width() * image.get_height() * image.get_bytesize()
+
+def get_display_format():
+	'''
+	Returns:
+		- tuple : The pixel format of the display (bits per pixel and masks), None if no display is open (headless tools)
+	'''
+	display = pygame.display.get_surface()
+	if display is None:
+		return None
+	return (display.get_bitsize(), display.get_masks())
+
+def convert_image(image):
+	'''
+	Convert an image to the pixel format of the display, so it is not converted again each time it is blitted.
+	Images with per-pixel transparency (sprites) keep their alpha channel, other ones (backgrounds) get the faster opaque format.
+	A display must be open.
+	Parameters:
+		- image (pygame.Surface) : The image to convert
+	Returns:
+		- pygame.Surface : The converted image
+	'''
+	if image.get_flags() & pygame.SRCALPHA:
+		return image.convert_alpha()
+	return image.convert()
+
+def convert_loaded_images():
+	'''
+	Convert the images already loaded to the pixel format of the display, and convert the next loaded images too.
+	Call it each time the display mode is set (not on every load_image: it would query the display at each call).
+	'''
+	global importedImages, spritesAtlas
+
+	if importedImages.convert(): # Sheets of the atlas have the pixel format of the previous display
+		spritesAtlas.clear()
 
 def load_image(path, size = None, force_import = False):
 	'''
-	Load an image in pygame and put it in the dict alreadyImportedImages.
-	To avoid lags, if image was already loaded, take it from the dict alreadyImportedImages.
+	Load an image in pygame and put it in the cache importedImages, or in spritesAtlas if it is a small sprite (see TextureAtlas).
+	To avoid lags, if image was already loaded (and not forgotten by the cache since), take it from the cache.
+	Decoded images are kept on disk between launches (see DiskImageCache), and once convert_loaded_images has been called, they are converted to the pixel format of the display (see convert_image).
 	Parameters:
 		- path (str) : The path of the image to load
 		- size (tuple(Int, Int)) : The size of the image
@@ -21,25 +542,125 @@ def load_image(path, size = None, force_import = False):
 	Returns:
 		- pygame.image : The instance of the loaded image
 	'''
-	global alreadyImportedImages
+	global importedImages, spritesAtlas, decodedImages
 
-	key = path+str(size)
+	key = (path, tuple(size) if size else None)
 
-	if key in alreadyImportedImages.keys() and not force_import:
-		image = alreadyImportedImages[key]
-		#print (path,'already loaded')
-	else:
-		image = pygame.image.load(path)
+	image = None
+	if not force_import:
+		image = spritesAtlas.get(key)
+		if image is None:
+			image = importedImages.get(key)
 
-		if size:
-			image = pygame.transform.scale(image, size)
+	if image is None:
+		image = store_image(key, path, decodedImages.load(path, size))
 
-		alreadyImportedImages[key] = image
-		
+	return image
+
+def store_image(key, path, image):
+	'''
+	Convert a decoded image and keep it in spritesAtlas or importedImages (end of load_image).
+	Parameters:
+		- key (tuple(path, size)) : The image key
+		- path (str) : The path of the image file
+		- image (pygame.Surface) : The decoded image
+	Returns:
+		- pygame.Surface : The kept image
+	'''
+	global importedImages, spritesAtlas
 
-	
+	if importedImages.format is not None:
+		image = convert_image(image)
+
+	if spritesAtlas.accepts(path, image):
+		return spritesAtlas.add(key, image) # Owned by the atlas, not counted in the budget of importedImages
+
+	importedImages.put(key, image)
 	return image
+
+def import_decoded_image(path, size, image):
+	'''
+	Keep an image decoded by another thread (see Prefetcher), so the next load_image of this path and size doesn't decode it.
+	Must be called from the thread of the display.
+	Parameters:
+		- path (str) : The path of the image file
+		- size (tuple(Int, Int)) : The size of the image, None for its original size
+		- image (pygame.Surface) : The decoded image, not converted
+	'''
+	global importedImages, spritesAtlas
+
+	key = (path, tuple(size) if size else None)
+	if spritesAtlas.get(key) is None and key not in importedImages:
+		store_image(key, path, image)
 		
+def load_flipped_image(path, size = None):
+	'''
+	Like load_image, but the image is vertically flipped (for entities when gravity is reversed).
+	The flipped image is cached too, so it is only flipped once.
+	Parameters:
+		- path (str) : The path of the image to load
+		- size (tuple(Int, Int)) : The size of the image
+			Default: None = take the default size fo the image
+	Returns:
+		- pygame.image : The flipped image
+	'''
+	global importedImages
+
+	key = (path, tuple(size) if size else None, 'flipped')
+
+	image = importedImages.get(key)
+	if image is None:
+		image = pygame.transform.flip(load_image(path, size), False, True)
+		importedImages.put(key, image)
+
+	return image
+
+def load_font(path = 'Ressources/Fonts/Baloo.ttf', size = 32):
+	'''
+	Open a font, or take it from loadedFonts if it was already opened at this size.
+	Parameters:
+		- path (str) : The path of the font file
+		- size (int) : The size of the font
+	Returns:
+		- pygame.font.Font : The font
+	'''
+	global loadedFonts
+	return loadedFonts.get(path, size)
+
+def render_text(text, size, color = (255, 255, 255), font_path = 'Ressources/Fonts/Baloo.ttf', antialias = True):
+	'''
+	Render a text, or take it from renderedTexts if it was already rendered with the same font, size and colour.
+	The returned surface is shared: blit it, never draw on it.
+	Parameters:
+		- text (str) : The text to render
+		- size (int) : The size of the font
+		- color (tuple(r, g, b)) : The colour of the text
+			Default: white
+		- font_path (str) : The path of the font file
+			Default: Baloo, the font of the game
+		- antialias (bool) : If True, the text has smooth edges
+	Returns:
+		- pygame.Surface : The rendered text
+	'''
+	global renderedTexts
+	return renderedTexts.render(text, size, color, font_path, antialias)
+
+def import_level_as_module(name):
+	'''
+	Import the level (as a module) for the given name
+	Parameters:
+	   name (str) : The level name to load
+	Returns:
+	   (module) : The level as a loaded module
+	'''
+
+	levelPath = 'Levels/'+name
+
+	spec = importlib.util.spec_from_file_location("Level", levelPath + ".py")
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
 def reversedEnumerate(list):
 	'''
 	Like a enumerate function, but reversing index.